@@ -47,5 +47,123 @@ SACO_EXCLUSIONS = [
     'car gum remover',
 ]
 
+MAX_WORKERS = 1
+SCRAPE_MEMO_ENABLED = True
+TASK_JOURNAL_FILE = 'scrape_journal.jsonl'
+RESULT_WRITER_BATCH_SIZE = 20
+RESULT_WRITER_FLUSH_SECONDS = 30
+RESULT_WRITER_QUEUE_SIZE = 200
+
+# 'sqlite' upserts into RESULT_STORE_FILE and re-exports OUTPUT_CSV_FILE at the end of the run, 'csv' appends to OUTPUT_CSV_FILE
+RESULT_BACKEND = 'sqlite'
+RESULT_STORE_FILE = 'results.sqlite'
+
+DETAILS_CACHE_ENABLED = True
+DETAILS_CACHE_FILE = 'product_details_cache.sqlite'
+DETAILS_CACHE_TTL_HOURS = 24
+
+WAIT_BUDGET_SECONDS = {
+    'amazon': 5,
+    'mumzworld': 5,
+    'saco': 8,
+    'fine': 4
+}
+WAIT_DEFAULT_BUDGET_SECONDS = 5
+# Waits for the element a page cannot be parsed without; running out raises TimeoutException.
+WAIT_PAGE_BUDGET_SECONDS = {
+    'amazon': 10,
+    'mumzworld': 15,
+    'saco': 15,
+    'fine': 15
+}
+WAIT_DEFAULT_PAGE_BUDGET_SECONDS = 15
+WAIT_SETTLE_SECONDS = 0.5
+WAIT_POLL_SECONDS = 0.1
+
+# Product pages opened ahead in background tabs while the current one is parsed; 0 disables it.
+TAB_PREFETCH_DEPTH = {
+    'amazon': 2,
+    'saco': 2
+}
+
+SACO_PREFETCH_NEXT_PAGE = True
+# Used to jump straight to page N when the 'Next' link has no usable href, e.g. "{search_url}?page={page}"
+SACO_PAGE_URL_TEMPLATE = None
+
+MUMZWORLD_EMBEDDED_DATA_ENABLED = True
+
+FINE_CATALOG_ENABLED = True
+FINE_CATALOG_FILE = 'fine_catalog.sqlite'
+FINE_CATALOG_START_URL = "https://ksa.finestore.com/en/products"
+FINE_CATALOG_MAX_AGE_HOURS = 24
+FINE_CATALOG_MAX_PAGES = 60
+FINE_CATALOG_MAX_PRODUCTS = 1500
+FINE_CATALOG_MAX_CANDIDATES = 40
+
+DRIVER_POOL_MAX_PAGES = 150
+DRIVER_POOL_MAX_RSS_MB = 2048
+DRIVER_POOL_START_RETRIES = 2
+
+VERDICT_CACHE_FILE = 'relevance_cache.sqlite'
+VERDICT_CACHE_TTL_DAYS = 30
+VERDICT_CACHE_MAX_ENTRIES = 50000
+
+AI_BATCH_SIZE = 20
+AI_MAX_RETRIES = 4
+AI_ESTIMATED_OUTPUT_TOKENS = 50
+AI_BACKOFF_BASE_SECONDS = 2
+AI_BACKOFF_MAX_SECONDS = 60
+GEMINI_REQUESTS_PER_MINUTE = 15
+GEMINI_TOKENS_PER_MINUTE = 250000
+AI_CONNECT_TIMEOUT_SECONDS = 5
+AI_READ_TIMEOUT_SECONDS = 30
+AI_MAX_IN_FLIGHT = 4
+
+VALIDATION_MAX_PENDING = 3
+
+HTTP_FIRST_SITES = {
+    'amazon': True,
+    'mumzworld': True,
+    'saco': True,
+    'fine': True
+}
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+HTTP_READ_TIMEOUT_SECONDS = 15
+HTTP_POOL_MAXSIZE = 8
+
+# 'html.parser', 'lxml' or 'html5lib'; falls back to 'html.parser' when the backend is not installed.
+HTML_PARSER = 'lxml'
+PARTIAL_PARSING = True
+
+# Units mode only: there the product page reads the count from the same title, while volume can come from the spec tables.
+AMAZON_CARD_REQUIRE_QUANTITY = True
+AMAZON_CARD_AI_PREFILTER = True
+
+CANDIDATE_SCORING = True
+CANDIDATE_MIN_SCORE = 0.2
+CANDIDATE_TOOL_PENALTY = 0.6
+CANDIDATE_AUTOMOTIVE_PENALTY = 0.4
+CANDIDATE_QUANTITY_BONUS = 0.2
+
+RELEVANCE_MODEL_FILE = 'relevance_model.joblib'
+RELEVANCE_MODEL_ENABLED = True
+RELEVANCE_MODEL_CONFIDENCE = 0.9
+RELEVANCE_MODEL_MIN_TRAINING_ROWS = 50
+RELEVANCE_MODEL_HOLDOUT = 0.2
+
+TITLE_INDEX_ENABLED = True
+TITLE_INDEX_THRESHOLD = 0.8
+TITLE_INDEX_NUM_PERM = 64
+TITLE_INDEX_BANDS = 16
+TITLE_INDEX_SHINGLE_SIZE = 4
+# Trailing " - <suffix>" parts dropped before comparing titles; anything else after a dash is part of the product.
+# Words that change what a product is for; titles differing in one of these never share a verdict.
+TITLE_INDEX_USE_WORDS = {
+    'wood', 'wooden', 'floor', 'glass', 'window', 'kitchen', 'bathroom', 'toilet', 'oven', 'grill', 'carpet',
+    'fabric', 'leather', 'tile', 'marble', 'granite', 'steel', 'stainless', 'metal', 'furniture', 'dish', 'laundry',
+    'hand', 'body', 'baby', 'pet', 'interior', 'exterior', 'surface', 'multi', 'purpose', 'industrial'
+}
+TITLE_INDEX_SELLER_SUFFIXES = {'amazon', 'amazon.sa', 'amazon basics', 'saco', 'fine', 'fine store', 'mumzworld', 'ksa', 'saudi arabia'}
+
 # USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"
\ No newline at end of file
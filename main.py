@@ -1,18 +1,221 @@
 import pandas as pd
 import time
-import csv
-import os  
+import os
+import argparse
+import queue
+import threading
 import config
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from services.ai_service import RelevanceAgent
+from services.driver_pool import DriverPool
+from services.verdict_cache import get_verdict_cache
+from services.details_cache import get_details_cache
+from services.fine_catalog import get_fine_catalog
+from services.title_index import get_title_index
+from services.scrape_memo import ScrapeMemo
+from services.task_journal import TaskJournal
+from services.result_writer import ResultWriter, CsvResultSink
+from services.result_store import ResultStore
+from services.rate_limiter import summarize_rate_limiters
+from services.page_fetcher import summarize_fetch_stats
+from services.wait_policy import summarize_wait_stats
+from services.tab_manager import summarize_tab_stats
+from services.page_archive import PageArchive, RecordingDriver, ReplayDriver
 from scrapers.amazon_scraper import AmazonScraper
 from scrapers.mumzworld_scraper import MumzworldScraper
 from scrapers.saco_scraper import SacoScraper
 from scrapers.fine_scraper import FineScraper
 
+def build_scrapers(driver, ai_agent):
+    return {
+        'amazon': AmazonScraper(driver, relevance_agent=ai_agent),
+        'mumzworld': MumzworldScraper(driver, relevance_agent=ai_agent),
+        'saco': SacoScraper(driver, relevance_agent=ai_agent),
+        'fine': FineScraper(driver, relevance_agent=ai_agent)
+    }
+
+def build_tasks(df_industry_instructions, industry_to_scrape):
+    tasks = []
+    for index, row in df_industry_instructions.iterrows():
+        sub_industry = row['Sub industry']
+        original_type_of_product = str(row['Type of product'])
+        original_type_of_product_lower = original_type_of_product.lower()
+        generic_type_of_product = str(row['Generic product type'])
+
+        try:
+            base_keyword = original_type_of_product_lower.split('-', 1)[1].strip()
+        except IndexError:
+            base_keyword = original_type_of_product_lower.strip()
+
+        search_modifiers = row.get('Search Modifiers', '')
+
+        fine_search_keyword = None
+        if pd.notna(search_modifiers) and 'fine:' in str(search_modifiers):
+            fine_parts = str(search_modifiers).split('fine:')
+            if len(fine_parts) > 1:
+                fine_search_keyword = fine_parts[1].strip()
+
+        search_keyword = f"{base_keyword} {search_modifiers}" if search_modifiers and not pd.isna(row.get('Search Modifiers')) and 'fine:' not in str(search_modifiers) else base_keyword
+        search_mode = 'units' if any(keyword in original_type_of_product_lower for keyword in ['wipes', 'rags', 'microfiber', 'brush']) else 'volume'
+
+        print(f">> Buscando '{search_keyword}' para '{sub_industry}' (Modo: {search_mode})")
+        if fine_search_keyword:
+            print(f"   -> Fine Store usará: '{fine_search_keyword}'")
+
+        sites_to_scrape = config.TARGET_MAP.get(sub_industry, []).copy()
+
+        fine_subindustries = ['Restaurants', 'Airports', 'Facilities Management', 'Hotels',
+                             'Land Transportation', 'Healthcare', 'Gyms', 'Spas and Salons',
+                             'Industrial Facilities', 'Faith']
+
+        if sub_industry in fine_subindustries:
+            if fine_search_keyword:
+                sites_to_scrape = ['fine']
+                print(f"   -> Usando SOLO Fine Store para '{original_type_of_product}' -> '{fine_search_keyword}'")
+            else:
+                if 'fine' in sites_to_scrape:
+                    sites_to_scrape.remove('fine')
+                    print(f"   -> Excluyendo Fine (sin mapeo específico para '{original_type_of_product}')")
+
+        if base_keyword in config.MUMZWORLD_EXCLUSIONS and 'mumzworld' in sites_to_scrape:
+            sites_to_scrape.remove('mumzworld')
+
+        if base_keyword in config.SACO_EXCLUSIONS and 'saco' in sites_to_scrape:
+            sites_to_scrape.remove('saco')
+
+        for site_name in sites_to_scrape:
+            tasks.append({
+                'industry': industry_to_scrape,
+                'subindustry': sub_industry,
+                'type_of_product': original_type_of_product,
+                'generic_product_type': generic_type_of_product,
+                'site': site_name,
+                'keyword': fine_search_keyword if site_name == 'fine' and fine_search_keyword else search_keyword,
+                'search_mode': search_mode
+            })
+    return tasks
+
+def scrape_site(driver_pool, ai_agent, task):
+    driver = driver_pool.acquire()
+    try:
+        if not driver:
+            raise RuntimeError("Sin navegador disponible")
+        scraper = build_scrapers(driver, ai_agent).get(task['site'])
+        if not scraper:
+            print(f"   -> Advertencia: No se encontró scraper para el sitio '{task['site']}'.")
+            return []
+        found_products = scraper.scrape(task['keyword'], task['search_mode'])
+        # Scrapers skip products whose pages fail; a dead session means the result is incomplete.
+        if not driver_pool.is_healthy(driver):
+            raise RuntimeError("Sesión del navegador perdida durante la búsqueda")
+        return found_products
+    finally:
+        driver_pool.release(driver)
+
+def build_rows(task, found_products):
+    rows = []
+    for product in found_products:
+        row_data = {
+            'date': time.strftime("%Y-%m-%d"),
+            'industry': task['industry'],
+            'subindustry': task['subindustry'],
+            'type_of_product': task['type_of_product'],
+            'generic_product_type': task['generic_product_type'],
+            'product': product.get('Product'),
+            'price_sar': product.get('Price_SAR'),
+            'company': product.get('Company'),
+            'source': task['site'],
+            'url': product.get('URL'),
+            'unit_of_measurement': product.get('Unit of measurement'),
+            'total_quantity': product.get('Total quantity')
+        }
+        rows.append(row_data)
+        print(f"    -> GUARDADO: {product.get('Product', 'N/A')[:60]}... (Fuente: {task['site']})")
+    return rows
+
+def worker_loop(worker_id, driver_pool, task_queue, result_queue, scrape_memo, result_writer, offline=False, fine_catalog_crawl=None):
+    ai_agent = RelevanceAgent(offline=offline)
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        try:
+            if task['site'] == 'fine' and fine_catalog_crawl is not None:
+                fine_catalog_crawl.join()
+            if config.SCRAPE_MEMO_ENABLED:
+                found_products, reused = scrape_memo.get_or_run(
+                    task['site'], task['keyword'], task['search_mode'],
+                    lambda: scrape_site(driver_pool, ai_agent, task)
+                )
+                if reused:
+                    print(f"  -> [Worker {worker_id}] Reutilizando {len(found_products)} resultado(s) de '{task['keyword']}' ({task['site']}) para '{task['subindustry']}'.")
+            else:
+                found_products = scrape_site(driver_pool, ai_agent, task)
+            result_writer.submit(build_rows(task, found_products), task)
+        except Exception as e:
+            print(f"  -> [Worker {worker_id}] Error en la tarea '{task['keyword']}' ({task['site']}): {e}")
+        result_queue.put(task)
+
+    ai_agent.close()
+    print(f"  -> [Worker {worker_id}] Sin tareas pendientes.")
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=config.MAX_WORKERS,
+                        help="Number of browser workers that run scrape tasks in parallel.")
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument('--record', metavar='DIR',
+                               help="Store every page seen by the scrapers in a page archive at DIR.")
+    archive_group.add_argument('--replay', metavar='DIR',
+                               help="Serve pages from the archive at DIR instead of a browser or the network.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip tasks already completed in the task journal of a previous, interrupted run.")
+    return parser.parse_args()
+
+def build_driver_pool(args, num_workers):
+    archive_dir = args.record or args.replay
+    if not archive_dir:
+        return DriverPool(num_workers), None
+
+    archive = PageArchive(archive_dir)
+    config.VERDICT_CACHE_FILE = os.path.join(archive_dir, 'verdicts.sqlite')
+    config.DETAILS_CACHE_FILE = os.path.join(archive_dir, 'product_details.sqlite')
+    config.FINE_CATALOG_FILE = os.path.join(archive_dir, 'fine_catalog.sqlite')
+    if args.replay:
+        config.VERDICT_CACHE_TTL_DAYS = 0
+        config.DETAILS_CACHE_TTL_HOURS = 0
+        print(f"  -> Modo REPLAY: sirviendo páginas desde '{archive_dir}'.")
+        return DriverPool(num_workers, driver_factory=lambda: ReplayDriver(archive)), archive
+
+    print(f"  -> Modo RECORD: guardando páginas en '{archive_dir}'.")
+    return DriverPool(num_workers, driver_wrapper=lambda driver: RecordingDriver(driver, archive)), archive
+
+def start_fine_catalog_crawl(driver_pool):
+    catalog = get_fine_catalog()
+    if catalog.is_fresh():
+        return None
+    print("  -> Catálogo de Fine desactualizado, recorriéndolo en un navegador aparte.")
+
+    def crawl():
+        driver = driver_pool.start_dedicated()
+        if driver is None:
+            print("  -> Sin navegador disponible para el catálogo de Fine, se usará la búsqueda en vivo.")
+            return
+        try:
+            FineScraper(driver, relevance_agent=None).crawl_catalog(catalog)
+        except Exception as e:
+            print(f"  -> Error recorriendo el catálogo de Fine: {e}")
+        finally:
+            driver_pool.retire(driver)
+
+    crawl_thread = threading.Thread(target=crawl, name='fine-catalog-crawl', daemon=True)
+    crawl_thread.start()
+    return crawl_thread
+
 def main():
+    args = parse_args()
+    num_workers = max(1, args.workers)
+
     try:
         df_instructions = pd.read_csv(config.INSTRUCTIONS_FILE)
         df_instructions = df_instructions.dropna(subset=['Type of product', 'Sub industry'])
@@ -20,146 +223,111 @@ def main():
         print(f"Error: El archivo de instrucciones '{config.INSTRUCTIONS_FILE}' no fue encontrado.")
         return
 
-    write_header = not os.path.exists(config.OUTPUT_CSV_FILE)
-    
-    with open(config.OUTPUT_CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=config.CSV_COLUMNS)
-        if write_header:
-            writer.writeheader()
-
+    tasks_by_industry = {}
     for industry_to_scrape in config.TARGET_MAP.keys():
         print(f"\n=================================================")
-        print(f"  INICIANDO PROCESO PARA LA SUBINDUSTRIA: '{industry_to_scrape}'")
+        print(f"  PREPARANDO TAREAS PARA LA SUBINDUSTRIA: '{industry_to_scrape}'")
         print(f"=================================================\n")
 
-        service = Service(ChromeDriverManager().install())
-        options = webdriver.ChromeOptions()
-        options.add_experimental_option('excludeSwitches', ['enable-automation'])
-        options.add_experimental_option('useAutomationExtension', False)
-        options.add_argument('--disable-notifications')
-        # options.add_argument('--headless')
-        options.add_argument('--disable-gpu')
-        options.add_argument(f"user-agent={config.USER_AGENT}")
-        options.add_argument('--log-level=3')
-
-        driver = None 
-        try:
-            driver = webdriver.Chrome(service=service, options=options)
-            print("  -> Navegador iniciado correctamente para esta subindustria.\n")
-        except Exception as e:
-            print(f"  -> Error al iniciar el navegador para '{industry_to_scrape}': {e}")
-            continue
-        
         df_industry_instructions = df_instructions[df_instructions['Sub industry'] == industry_to_scrape].copy()
 
         if df_industry_instructions.empty:
             print(f"  -> No se encontraron productos para la subindustria '{industry_to_scrape}'. Saltando a la siguiente.")
-            driver.quit()
             continue
 
-        ai_agent = RelevanceAgent()
-        scrapers = {
-            'amazon': AmazonScraper(driver, relevance_agent=ai_agent),
-            'mumzworld': MumzworldScraper(driver, relevance_agent=ai_agent),
-            'saco': SacoScraper(driver, relevance_agent=ai_agent),
-            'fine': FineScraper(driver, relevance_agent=ai_agent)
-        }
-        
-        all_found_products = []
-
-        for index, row in df_industry_instructions.iterrows():
-            sub_industry = row['Sub industry']
-            original_type_of_product = str(row['Type of product'])
-            original_type_of_product_lower = original_type_of_product.lower() 
-            generic_type_of_product = str(row['Generic product type'])
-            search_modifier = str(row['Search Modifiers'])
-            
-            try:
-                base_keyword = original_type_of_product_lower.split('-', 1)[1].strip()
-            except IndexError:
-                base_keyword = original_type_of_product_lower.strip()
-
-            search_modifiers = row.get('Search Modifiers', '')
-            
-            fine_search_keyword = None
-            if pd.notna(search_modifiers) and 'fine:' in str(search_modifiers):
-                fine_parts = str(search_modifiers).split('fine:')
-                if len(fine_parts) > 1:
-                    fine_search_keyword = fine_parts[1].strip()
-            
-            search_keyword = f"{base_keyword} {search_modifiers}" if search_modifiers and not pd.isna(row.get('Search Modifiers')) and 'fine:' not in str(search_modifiers) else base_keyword
-            search_mode = 'units' if any(keyword in original_type_of_product_lower for keyword in ['wipes', 'rags', 'microfiber', 'brush']) else 'volume'
-
-            print(f">> Buscando '{search_keyword}' para '{sub_industry}' (Modo: {search_mode})")
-            if fine_search_keyword:
-                print(f"   -> Fine Store usará: '{fine_search_keyword}'")
-
-            sites_to_scrape = config.TARGET_MAP.get(sub_industry, []).copy()
-            
-            fine_subindustries = ['Restaurants', 'Airports', 'Facilities Management', 'Hotels', 
-                                 'Land Transportation', 'Healthcare', 'Gyms', 'Spas and Salons', 
-                                 'Industrial Facilities', 'Faith']
-            
-            if sub_industry in fine_subindustries:
-                if fine_search_keyword:
-                    sites_to_scrape = ['fine']
-                    print(f"   -> Usando SOLO Fine Store para '{original_type_of_product}' -> '{fine_search_keyword}'")
-                else:
-                    if 'fine' in sites_to_scrape:
-                        sites_to_scrape.remove('fine')
-                        print(f"   -> Excluyendo Fine (sin mapeo específico para '{original_type_of_product}')")
-            
-            if base_keyword in config.MUMZWORLD_EXCLUSIONS and 'mumzworld' in sites_to_scrape:
-                sites_to_scrape.remove('mumzworld')
-            
-            if base_keyword in config.SACO_EXCLUSIONS and 'saco' in sites_to_scrape:
-                sites_to_scrape.remove('saco')
-
-            for site_name in sites_to_scrape:
-                scraper = scrapers.get(site_name)
-                if scraper:
-                    keyword_to_use = fine_search_keyword if site_name == 'fine' and fine_search_keyword else search_keyword
-                    found_products = scraper.scrape(keyword_to_use, search_mode)
-                    
-                    for product in found_products:
-                        row_data = {
-                            'date': time.strftime("%Y-%m-%d"),
-                            'industry': industry_to_scrape,
-                            'subindustry': sub_industry,
-                            'type_of_product': original_type_of_product,
-                            'generic_product_type': generic_type_of_product,
-                            'product': product.get('Product'),
-                            'price_sar': product.get('Price_SAR'),
-                            'company': product.get('Company'),
-                            'source': site_name,
-                            'url': product.get('URL'),
-                            'unit_of_measurement': product.get('Unit of measurement'),
-                            'total_quantity': product.get('Total quantity')
-                        }
-                        all_found_products.append(row_data)
-                        print(f"    -> GUARDADO: {product.get('Product', 'N/A')[:60]}... (Fuente: {site_name})")
-                else:
-                    print(f"   -> Advertencia: No se encontró scraper para el sitio '{site_name}'.")
-
-        if all_found_products:
-            print(f"\n--- Guardando {len(all_found_products)} productos encontrados para la industria '{industry_to_scrape}' ---")
-            try:
-                with open(config.OUTPUT_CSV_FILE, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=config.CSV_COLUMNS)
-                    writer.writerows(all_found_products)
-                print(f"  -> ¡Éxito! Datos añadidos a '{config.OUTPUT_CSV_FILE}'.")
-            except IOError as e:
-                print(f"  -> Error al escribir en el archivo CSV: {e}")
-        else:
-            print(f"\n--- No se encontraron productos para guardar en la industria '{industry_to_scrape}'. ---")
-
-        if driver:
-            driver.quit()
-        print(f"\n  -> Navegador cerrado. Proceso para '{industry_to_scrape}' completado.")
-        print("  -> Descansando 10 segundos antes de la siguiente industria...")
-        time.sleep(10)
+        tasks_by_industry[industry_to_scrape] = build_tasks(df_industry_instructions, industry_to_scrape)
+
+    journal = TaskJournal(config.TASK_JOURNAL_FILE, resume=args.resume)
+    pending_by_industry = {}
+    all_tasks = []
+    for industry_to_scrape, tasks in tasks_by_industry.items():
+        remaining_tasks = [task for task in tasks if not journal.is_completed(task)]
+        if len(remaining_tasks) < len(tasks):
+            print(f"  -> '{industry_to_scrape}': {len(tasks) - len(remaining_tasks)}/{len(tasks)} tareas ya completadas según el diario.")
+        if remaining_tasks:
+            pending_by_industry[industry_to_scrape] = len(remaining_tasks)
+            all_tasks.extend(remaining_tasks)
+
+    if not all_tasks:
+        journal.close()
+        print("\n\n--- NO HAY TAREAS PENDIENTES ---")
+        return
+
+    num_workers = min(num_workers, len(all_tasks))
+    print(f"\n  -> {len(all_tasks)} tareas repartidas entre {num_workers} navegador(es).\n")
+
+    driver_pool, archive = build_driver_pool(args, num_workers)
+    driver_pool.warm_up()
+    fine_catalog_crawl = None
+    if config.FINE_CATALOG_ENABLED and any(task['site'] == 'fine' for task in all_tasks):
+        fine_catalog_crawl = start_fine_catalog_crawl(driver_pool)
+    if fine_catalog_crawl is not None:
+        # Fine tasks wait for the crawl, so let every other site go first.
+        all_tasks.sort(key=lambda task: task['site'] == 'fine')
+
+    task_queue = queue.Queue()
+    result_queue = queue.Queue()
+    for task in all_tasks:
+        task_queue.put(task)
+    for _ in range(num_workers):
+        task_queue.put(None)
+
+    def journal_flushed_tasks(flushed):
+        for task, rows in flushed:
+            journal.record_task(task, rows)
+
+    if config.RESULT_BACKEND == 'sqlite':
+        result_sink = ResultStore(config.RESULT_STORE_FILE)
+        # The CSV is re-exported from the store at the end, so a new store starts with the rows it already holds.
+        if not result_sink.count() and os.path.exists(config.OUTPUT_CSV_FILE):
+            print(f"  -> Importadas {result_sink.import_csv(config.OUTPUT_CSV_FILE)} fila(s) de '{config.OUTPUT_CSV_FILE}' al almacén de resultados.")
+    else:
+        result_sink = CsvResultSink(config.OUTPUT_CSV_FILE, config.CSV_COLUMNS)
+    result_writer = ResultWriter(result_sink, on_flush=journal_flushed_tasks)
+    scrape_memo = ScrapeMemo()
+    workers = [threading.Thread(target=worker_loop, args=(worker_id, driver_pool, task_queue, result_queue, scrape_memo, result_writer, bool(args.replay), fine_catalog_crawl), daemon=True)
+               for worker_id in range(1, num_workers + 1)]
+    for worker in workers:
+        worker.start()
+
+    for _ in range(len(all_tasks)):
+        task = result_queue.get()
+        industry_to_scrape = task['industry']
+        pending_by_industry[industry_to_scrape] -= 1
+        if pending_by_industry[industry_to_scrape] == 0:
+            print(f"\n  -> Proceso para '{industry_to_scrape}' completado.")
+
+    for worker in workers:
+        worker.join()
+    if fine_catalog_crawl is not None:
+        fine_catalog_crawl.join()
+    driver_pool.close()
+    result_writer.close()
+    journal.close()
+    if config.RESULT_BACKEND == 'sqlite':
+        result_store = ResultStore(config.RESULT_STORE_FILE)
+        print(f"  -> Exportadas {result_store.export_csv(config.OUTPUT_CSV_FILE)} fila(s) a '{config.OUTPUT_CSV_FILE}'.")
+        result_store.close()
+    print(f"  -> {result_writer.summary()}")
+    print(f"  -> {get_verdict_cache().summary()}")
+    if config.DETAILS_CACHE_ENABLED:
+        print(f"  -> {get_details_cache().summary()}")
+    if config.SCRAPE_MEMO_ENABLED:
+        print(f"  -> {scrape_memo.summary()}")
+    if config.FINE_CATALOG_ENABLED:
+        print(f"  -> {get_fine_catalog().summary()}")
+    if config.TITLE_INDEX_ENABLED:
+        print(f"  -> {get_title_index().summary()}")
+    if config.RELEVANCE_MODEL_ENABLED:
+        from services.relevance_model import get_relevance_model
+        if get_relevance_model() is not None:
+            print(f"  -> {get_relevance_model().summary()}")
+    for line in summarize_rate_limiters() + summarize_fetch_stats() + summarize_tab_stats() + summarize_wait_stats():
+        print(f"  -> {line}")
+    if archive:
+        print(f"  -> {archive.summary()}")
 
     print("\n\n--- PROCESO COMPLETO PARA TODAS LAS INDUSTRIAS ---")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,32 @@
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from urllib.parse import urljoin
-from utils import parse_volume_string, parse_count_string
+import config
+from utils import parse_volume_string, parse_count_string, make_soup, page_reports_no_results
+from services.validation_pipeline import ValidationPipeline
+from services.page_fetcher import PageFetcher
+from services.candidate_scorer import rank_candidates
+from services.details_cache import get_details_cache
+from services.wait_policy import WaitPolicy
 
 class AmazonScraper:
+    SEARCH_PAGE_PARSE_ONLY = SoupStrainer('div', attrs={'data-component-type': 's-search-result'})
+    PRODUCT_PAGE_PARSE_ONLY = ['span', 'table', 'tr']
+    # Units are read from the title; volume needs a second source from the spec table or the item volume row.
+    PRODUCT_PAGE_REQUIRED = {
+        'units': ["span#productTitle"],
+        'volume': ["span#productTitle", "table#productDetails_techSpec_section_1, tr.po-item_volume"]
+    }
+
     def __init__(self, driver, relevance_agent):
         self.driver = driver
         self.relevance_agent = relevance_agent 
         self.base_url = "https://www.amazon.sa"
+        self.fetcher = PageFetcher(driver, 'amazon')
+        self.details_cache = get_details_cache() if config.DETAILS_CACHE_ENABLED else None
+        self.waits = WaitPolicy(driver, 'amazon')
 
     def _log(self, msg):
         print(msg)
@@ -31,6 +48,15 @@ class AmazonScraper:
                             results[field] = value_cell.get_text(strip=True)
         return results
 
+    def _extract_price(self, scope):
+        price_whole = self._safe_get_text(scope.find('span', class_='a-price-whole'))
+        price_fraction = self._safe_get_text(scope.find('span', class_='a-price-fraction'))
+        
+        if price_whole:
+            price_str = price_whole.replace(',', '').rstrip('.')
+            return f"{price_str}.{price_fraction}" if price_fraction else price_str
+        return None
+
     def _extract_details_from_product_page(self, soup, search_mode='volume'):
         details = {
             'Product': 'Not found', 'Price_SAR': '0.00', 'Company': 'Company not found',
@@ -40,12 +66,7 @@ class AmazonScraper:
         details['Product'] = self._safe_get_text(soup.find('span', id='productTitle')) or details['Product']
         brand_row = soup.find('tr', class_='po-brand')
         details['Company'] = self._safe_get_text(brand_row.find('span', class_='po-break-word')) if brand_row else details['Company']
-        price_whole = self._safe_get_text(soup.find('span', class_='a-price-whole'))
-        price_fraction = self._safe_get_text(soup.find('span', class_='a-price-fraction'))
-        
-        if price_whole:
-            price_str = price_whole.replace(',', '').rstrip('.')
-            details['Price_SAR'] = f"{price_str}.{price_fraction}" if price_fraction else price_str
+        details['Price_SAR'] = self._extract_price(soup) or details['Price_SAR']
         raw_title = details.get('Product')
         tech_fields = self._extract_from_table(soup, 'productDetails_techSpec_section_1', ['volume', 'weight'])
         item_volume_row = soup.find('tr', class_='po-item_volume')
@@ -89,61 +110,160 @@ class AmazonScraper:
                 self._log("     [Validator] ❌ Not enough matching volume values found.")
         return details
 
+    def _extract_card_details(self, container, search_mode):
+        link_tag = container.find('a', class_='a-link-normal')
+        if not link_tag or 'spons' in link_tag.get('href', ''):
+            return None, None
+
+        details = {
+            'Product': 'Not found', 'Price_SAR': '0.00', 'Company': 'Company not found',
+            'Unit of measurement': 'units', 'Total quantity': 0, 'Validation_Status': 'Not Found',
+            'URL': urljoin(self.base_url, link_tag['href'])
+        }
+
+        title_headings = container.select("[data-cy='title-recipe'] h2") or container.find_all('h2')
+        if title_headings:
+            details['Product'] = self._safe_get_text(title_headings[-1]) or details['Product']
+            if len(title_headings) > 1:
+                details['Company'] = self._safe_get_text(title_headings[0]) or details['Company']
+        details['Price_SAR'] = self._extract_price(container) or details['Price_SAR']
+
+        card_quantity = None
+        if details['Product'] != 'Not found':
+            card_quantity = parse_count_string(details['Product']) if search_mode == 'units' else parse_volume_string(details['Product'])
+        if card_quantity and search_mode == 'units':
+            details['Total quantity'] = card_quantity['quantity']
+            details['Unit of measurement'] = card_quantity['unit']
+            details['Validation_Status'] = 'From Card Title'
+        return details, card_quantity
+
+    def _card_is_complete(self, card_details, search_mode):
+        # Volume mode needs two agreeing sources, and only the product page has the spec tables.
+        return (search_mode == 'units' and card_details['Total quantity'] > 0
+                and card_details['Price_SAR'] != '0.00' and card_details['Company'] != 'Company not found')
+
+    def _is_cached(self, product_url, search_mode):
+        return bool(self.details_cache) and self.details_cache.contains('amazon', product_url, search_mode)
+
+    def _visit_product_page(self, card_details, search_mode):
+        product_url = card_details['URL']
+        product_details = self.details_cache.get('amazon', product_url, search_mode) if self.details_cache else None
+        if product_details is not None:
+            self._log(f"    > Product details (cache): {product_details['Product'][:60]}...")
+        else:
+            product_details = self._load_product_page(product_url, search_mode)
+            if product_details is None:
+                return None
+
+        for field, missing_value in (('Price_SAR', '0.00'), ('Company', 'Company not found')):
+            if product_details[field] == missing_value and card_details[field] != missing_value:
+                product_details[field] = card_details[field]
+        return product_details
+
+    def _load_product_page(self, product_url, search_mode):
+        self._log(f"    > Visiting product page: {product_url[:120]}...")
+        try:
+            product_soup = self.fetcher.fetch(
+                product_url,
+                self.PRODUCT_PAGE_REQUIRED[search_mode],
+                EC.any_of(
+                    EC.presence_of_element_located((By.ID, "productDetails_techSpec_section_1")),
+                    EC.presence_of_element_located((By.ID, "detailBullets_feature_div")),
+                    EC.presence_of_element_located((By.CLASS_NAME, "po-item_volume"))
+                ),
+                timeout=10,
+                parse_only=self.PRODUCT_PAGE_PARSE_ONLY
+            )
+        except Exception:
+            self._log(f"    ! No details section found for product. Skipping.")
+            return None
+
+        product_details = self._extract_details_from_product_page(product_soup, search_mode)
+        product_details['URL'] = product_url
+        if self.details_cache and product_details['Product'] != 'Not found':
+            self.details_cache.put('amazon', product_url, search_mode, product_details)
+        return product_details
+
+    def _collect_candidates(self, product_containers, search_mode):
+        candidates = []
+        for container in product_containers:
+            card_details, card_quantity = self._extract_card_details(container, search_mode)
+            if card_details is None:
+                continue
+            if config.AMAZON_CARD_REQUIRE_QUANTITY and search_mode == 'units' and not card_quantity:
+                self._log(f"    -> SKIPPED (no quantity in listing title): {card_details['Product'][:60]}...")
+                continue
+            candidates.append(card_details)
+        return candidates
+
     def scrape(self, keyword, search_mode):
         self._log(f"  [Amazon Scraper] Searching: '{keyword}' (Mode: {search_mode})")
-        found_products = []
         products_to_find = 2
+        pipeline = ValidationPipeline(self.relevance_agent, keyword, products_to_find, self._log)
         search_url = f"{self.base_url}/s?k={keyword.replace(' ', '+')}&language=en_AE"
 
         try:
             self.driver.get(search_url)
-            import time; time.sleep(3)
-            WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-component-type='s-search-result']")))
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+            try:
+                self.waits.require_selector("div[data-component-type='s-search-result']")
+            except TimeoutException:
+                if not page_reports_no_results(self.driver.page_source):
+                    raise
+                self._log("    > Amazon reports no results for this search.")
+                return pipeline.finish()
+            self.waits.selector_stable("div[data-component-type='s-search-result']")
+            soup = make_soup(self.driver.page_source, self.SEARCH_PAGE_PARSE_ONLY)
             product_containers = soup.find_all('div', {'data-component-type': 's-search-result'})
 
             if not product_containers:
                 self._log("    ! Warning: No product containers found.")
-                return []
+                return pipeline.finish()
+
+            candidates = self._collect_candidates(product_containers, search_mode)
+            candidates = rank_candidates(candidates, keyword, search_mode, log=self._log)
+            self._log(f"    > {len(candidates)}/{len(product_containers)} listing cards look plausible.")
 
-            for container in product_containers:
-                if len(found_products) >= products_to_find:
-                    self._log(f"    > Target of {products_to_find} valid products reached.")
+            window_size = config.AI_BATCH_SIZE
+            for window_start in range(0, len(candidates), window_size):
+                if pipeline.is_satisfied():
                     break
+                window = candidates[window_start:window_start + window_size]
+                if config.AMAZON_CARD_AI_PREFILTER:
+                    verdicts = self.relevance_agent.is_relevant_many([card['Product'] for card in window], keyword)
+                    for card_details, is_relevant in zip(window, verdicts):
+                        if not is_relevant:
+                            self._log(f"    -> DISCARDED (listing title not relevant by AI): {card_details['Product'][:60]}...")
+                    window = [card_details for card_details, is_relevant in zip(window, verdicts) if is_relevant]
+
+                page_urls = [card['URL'] for card in window
+                             if not self._card_is_complete(card, search_mode) and not self._is_cached(card['URL'], search_mode)]
+                for card_details in window:
+                    if pipeline.throttle():
+                        break
 
-                link_tag = container.find('a', class_='a-link-normal')
-                if not link_tag or 'spons' in link_tag.get('href', ''):
-                    continue
-
-                product_url = urljoin(self.base_url, link_tag['href'])
-                self._log(f"    > Visiting product page: {product_url[:120]}...")
-                self.driver.get(product_url)
-                try:
-                    WebDriverWait(self.driver, 10).until(EC.any_of(
-                        EC.presence_of_element_located((By.ID, "productDetails_techSpec_section_1")),
-                        EC.presence_of_element_located((By.ID, "detailBullets_feature_div")),
-                        EC.presence_of_element_located((By.CLASS_NAME, "po-item_volume"))
-                    ))
-                except Exception:
-                    self._log(f"    ! No details section found for product. Skipping.")
-                    continue
-                
-                product_soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                product_details = self._extract_details_from_product_page(product_soup, search_mode)
-                product_details['URL'] = product_url
-
-                if product_details.get('Total quantity', 0) > 0:
-                    is_relevant = self.relevance_agent.is_relevant(product_details.get('Product'), keyword)
-                    time.sleep(2)
-
-                    if is_relevant:
-                        found_products.append(product_details)
-                        self._log(f"    -> VALID product found: {product_details.get('Product')[:60]}...")
+                    if self._card_is_complete(card_details, search_mode):
+                        self._log(f"    > Listing card has every field. Skipping product page: {card_details['Product'][:60]}...")
+                        product_details = card_details
                     else:
-                        self._log(f"    -> DISCARDED (Not relevant by AI): {product_details.get('Product')[:60]}...")
-                else:
-                    self._log(f"    -> DISCARDED (no valid data): {product_details.get('Product')[:60]}...")
+                        if card_details['URL'] in page_urls:
+                            self.fetcher.prefetch(card_details['URL'], page_urls[page_urls.index(card_details['URL']) + 1:])
+                        product_details = self._visit_product_page(card_details, search_mode)
+                        if product_details is None:
+                            continue
+
+                    if product_details.get('Total quantity', 0) > 0:
+                        self._log(f"    -> Queued for AI validation: {product_details.get('Product')[:60]}...")
+                        pipeline.submit(product_details)
+                    else:
+                        self._log(f"    -> DISCARDED (no valid data): {product_details.get('Product')[:60]}...")
+
+            if pipeline.drain():
+                self._log(f"    > Target of {products_to_find} valid products reached.")
         except Exception as e:
             self._log(f"    ! Unexpected error occurred in Amazon scraper: {e}")
+            pipeline.finish()
+            raise
+        finally:
+            self.fetcher.close_tabs()
 
-        return found_products
\ No newline at end of file
+        return pipeline.finish()
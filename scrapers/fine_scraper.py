@@ -1,20 +1,31 @@
-import time
 import re
+import time
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException, ElementClickInterceptedException
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from urllib.parse import urljoin, quote
-from utils import parse_volume_string, parse_count_string
+import config
+from utils import parse_volume_string, parse_count_string, make_soup, page_reports_no_results
+from services.validation_pipeline import ValidationPipeline
+from services.page_fetcher import PageFetcher
+from services.candidate_scorer import rank_candidates
+from services.details_cache import get_details_cache
+from services.wait_policy import WaitPolicy
+from services.fine_catalog import get_fine_catalog
 
 
 class FineScraper:
+    PRODUCT_PAGE_PARSE_ONLY = ['div', 'span', 'h1']
+
     def __init__(self, driver, relevance_agent):
         self.driver = driver
         self.relevance_agent = relevance_agent
         self.base_url = "https://ksa.finestore.com/en"
         self.products_to_find_limit = 2
+        self.fetcher = PageFetcher(driver, 'fine')
+        self.details_cache = get_details_cache() if config.DETAILS_CACHE_ENABLED else None
+        self.waits = WaitPolicy(driver, 'fine')
+        self.catalog = get_fine_catalog() if config.FINE_CATALOG_ENABLED else None
 
     def _log(self, msg):
         print(msg)
@@ -26,7 +37,6 @@ class FineScraper:
         try:
             js_script = 'document.querySelectorAll(".newsletter, .subscribe, .popup, .ecomz-popup, .modal, .overlay").forEach(function(e){e.style.display="none"});'
             self.driver.execute_script(js_script)
-            time.sleep(0.3)
             return True
         except Exception:
             return False
@@ -118,31 +128,25 @@ class FineScraper:
             pass
         return 1
 
-    def _extract_product_details(self, product_url, search_mode):
+    def _wait_for_product_page(self):
+        for _ in range(2):
+            if self.waits.selector_present("div.ecomz-product-name-style", timeout=8):
+                break
+            self._close_modal()
+
+        self.waits.selector_present("div.ecomz-product-price-style")
+
+        return make_soup(self.driver.page_source, self.PRODUCT_PAGE_PARSE_ONLY)
+
+    def _extract_product_details(self, product_url, search_mode, soup=None):
         details = {
             'Product': 'Not found', 'Price_SAR': '0.00', 'Company': 'Fine',
             'URL': product_url, 'Unit of measurement': 'units', 'Total quantity': 0
         }
         
         try:
-            for _ in range(2):
-                try:
-                    WebDriverWait(self.driver, 8).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "div.ecomz-product-name-style"))
-                    )
-                    break
-                except TimeoutException:
-                    self._close_modal()
-                    time.sleep(0.5)
-
-            try:
-                WebDriverWait(self.driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.ecomz-product-price-style"))
-                )
-            except TimeoutException:
-                pass
-
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+            if soup is None:
+                soup = self._wait_for_product_page()
 
             details['Product'] = (
                 self._safe_get_text(soup.select_one("span.mg-l-0.f-xs-18")) or
@@ -192,127 +196,203 @@ class FineScraper:
             
         return True, "Valid"
 
-    def _navigate_to_product(self, link_element, href):
-        for attempt in range(2):
-            try:
-                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", link_element)
-                time.sleep(0.4)
-                
-                try:
-                    link_element.click()
-                except Exception:
-                    self.driver.execute_script("arguments[0].click();", link_element)
-                
-                WebDriverWait(self.driver, 12).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.ecomz-product-name-style"))
-                )
-                return True
-                
-            except Exception:
-                if attempt == 0:
-                    self._close_modal()
-                    if href:
-                        try:
-                            absolute_url = urljoin(self.base_url, href)
-                            self.driver.get(absolute_url)
-                            WebDriverWait(self.driver, 12).until(
-                                EC.presence_of_element_located((By.CSS_SELECTOR, "div.ecomz-product-name-style"))
-                            )
-                            return True
-                        except Exception:
-                            continue
-                
-        return False
+    def _harvest_listing(self, page_url):
+        soup = make_soup(self.driver.page_source, ['div', 'a'])
+        products = []
+        for link in soup.select("div.listing-page a.display-flex[href]"):
+            products.append({'URL': urljoin(page_url, link['href']), 'Product': link.get_text(" ", strip=True)})
+
+        next_url = None
+        next_link = next((link for link in soup.find_all('a') if 'Next' in link.get_text()), None)
+        if next_link is not None:
+            href = next_link.get('href', '')
+            if href and not href.startswith(('#', 'javascript')):
+                next_url = urljoin(page_url, href)
+        return products, next_link is not None, next_url
+
+    def _load_listing(self, url):
+        self.driver.get(url)
+        self.waits.require_selector("div.listing-page a.display-flex")
+        self.waits.selector_stable("div.listing-page a.display-flex")
+
+    def _load_product_soup(self, product_url):
+        product_soup = self.fetcher.fetch_http(product_url, ["div.ecomz-product-name-style", "div.ecomz-product-price-style"], self.PRODUCT_PAGE_PARSE_ONLY)
+        if product_soup is not None:
+            return product_soup, False
+        self.driver.get(product_url)
+        return self._wait_for_product_page(), True
+
+    def _visit_product(self, product_url, search_mode):
+        product_details = self.details_cache.get('fine', product_url, search_mode) if self.details_cache else None
+        if product_details is not None:
+            self._log(f"      -> Product details (cache)")
+            return product_details, False
+
+        product_soup, left_listing = self._load_product_soup(product_url)
+        product_details = self._extract_product_details(product_url, search_mode, product_soup)
+        if self.details_cache and product_details['Product'] != 'Not found':
+            self.details_cache.put('fine', product_url, search_mode, product_details)
+        return product_details, left_listing
+
+    def _go_to_next_listing(self, listing_url, next_url, left_listing):
+        if next_url:
+            self._load_listing(next_url)
+            return
+        if left_listing:
+            self._load_listing(listing_url)
+        next_page_button = self.driver.find_element(By.XPATH, "//a[contains(text(), 'Next')]")
+        self.driver.execute_script("arguments[0].click();", next_page_button)
+        self.waits.url_changes(listing_url)
+        self.waits.require_selector("div.listing-page a.display-flex")
+        self.waits.selector_stable("div.listing-page a.display-flex")
+
+    def crawl_catalog(self, catalog, max_pages=None, max_products=None):
+        max_pages = max_pages or config.FINE_CATALOG_MAX_PAGES
+        max_products = max_products or config.FINE_CATALOG_MAX_PRODUCTS
+        self._log(f"  [Fine Scraper] Crawling catalog into '{catalog.path}' (max {max_pages} pages, {max_products} products)")
+
+        started_at = time.time()
+        seen_urls = set()
+        stored = 0
+        pages_crawled = 0
+        complete = False
+        previous_page = None
+
+        try:
+            self._load_listing(config.FINE_CATALOG_START_URL)
+            while pages_crawled < max_pages and len(seen_urls) < max_products:
+                listing_url = self.driver.current_url
+                products, has_next_page, next_url = self._harvest_listing(listing_url)
+                if not products or [item['URL'] for item in products] == previous_page:
+                    complete = True
+                    break
+                previous_page = [item['URL'] for item in products]
+                pages_crawled += 1
+
+                left_listing = False
+                for listing_item in products:
+                    if listing_item['URL'] in seen_urls or len(seen_urls) >= max_products:
+                        continue
+                    seen_urls.add(listing_item['URL'])
+                    try:
+                        product_soup, loaded_in_browser = self._load_product_soup(listing_item['URL'])
+                    except TimeoutException:
+                        left_listing = True
+                        continue
+                    left_listing = left_listing or loaded_in_browser
+
+                    details_by_mode = {search_mode: self._extract_product_details(listing_item['URL'], search_mode, product_soup)
+                                       for search_mode in ('units', 'volume')}
+                    if details_by_mode['units']['Product'] != 'Not found':
+                        catalog.add_product(listing_item['URL'], details_by_mode['units']['Product'], details_by_mode)
+                        stored += 1
+
+                self._log(f"      -> Catalog page {pages_crawled}: {len(seen_urls)} products so far")
+                if not has_next_page:
+                    complete = True
+                    break
+                self._go_to_next_listing(listing_url, next_url, left_listing)
+
+        except (TimeoutException, NoSuchElementException):
+            pass
+        except Exception as e:
+            self._log(f"    ! Unexpected error while crawling catalog: {e}")
+
+        catalog.record_crawl(started_at, pages_crawled, stored, complete)
+        self._log(f"  [Fine Scraper] Catalog crawl finished: {stored}/{len(seen_urls)} products stored over {pages_crawled} pages ({'complete' if complete else 'bounded'})")
+
+    def _scrape_from_catalog(self, keyword, search_mode):
+        candidates = self.catalog.search(keyword, search_mode)
+        self._log(f"      -> Found {len(candidates)} products in local catalog")
+        if not candidates:
+            return None
+
+        pipeline = ValidationPipeline(self.relevance_agent, keyword, self.products_to_find_limit, self._log)
+        for product_details in rank_candidates(candidates, keyword, search_mode, log=self._log):
+            if pipeline.throttle():
+                break
+            is_valid, validation_msg = self._is_valid_product(product_details)
+            if not is_valid:
+                self._log(f"      -> Validation failed: {validation_msg}")
+                continue
+            self._log(f"      -> Queued for AI validation: {product_details['Product'][:50]}...")
+            pipeline.submit(product_details)
+        return pipeline.finish() or None
 
     def scrape(self, keyword, search_mode):
         self._log(f"  [Fine Scraper] Searching for: '{keyword}' (Mode: {search_mode})")
-        
+
+        if self.catalog and self.catalog.is_fresh():
+            found_products = self._scrape_from_catalog(keyword, search_mode)
+            if found_products is not None:
+                return found_products
+            self._log("      -> No accepted product in local catalog, falling back to live search")
+
         search_url = f"{self.base_url}/products?keyword={quote(keyword)}"
-        all_found_products = []
+        pipeline = ValidationPipeline(self.relevance_agent, keyword, self.products_to_find_limit, self._log)
         page_num = 1
+        previous_page = None
 
         try:
-            self.driver.get(search_url)
+            self._load_listing(search_url)
+        except TimeoutException:
+            if not page_reports_no_results(self.driver.page_source):
+                pipeline.finish()
+                raise
+            self._log("      -> Fine reports no results for this search.")
+            return pipeline.finish()
         except Exception as e:
             self._log(f"    ! Error loading search URL: {e}")
-            return []
+            pipeline.finish()
+            raise
 
-        while len(all_found_products) < self.products_to_find_limit:
+        while not pipeline.is_satisfied():
             try:
-                WebDriverWait(self.driver, 15).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.listing-page a.display-flex"))
-                )
-                
                 search_page_url = self.driver.current_url
-                time.sleep(1.5)
-
-                link_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.listing-page a.display-flex")
-                num_products = len(link_elements)
-                
-                self._log(f"      -> Found {num_products} products on search page")
+                products, has_next_page, next_url = self._harvest_listing(search_page_url)
+                self._log(f"      -> Found {len(products)} products on search page")
                 
-                if num_products == 0:
+                if not products:
+                    break
+                if [item['URL'] for item in products] == previous_page:
+                    self._log("      -> Listing did not change after 'Next'. Reached the last page.")
                     break
+                previous_page = [item['URL'] for item in products]
 
-                for i in range(num_products):
-                    if len(all_found_products) >= self.products_to_find_limit:
+                left_listing = False
+                for position, listing_item in enumerate(rank_candidates(products, keyword, search_mode, log=self._log), start=1):
+                    if pipeline.throttle():
                         break
                         
-                    self._log(f"      -> Processing product {i+1}/{num_products}")
-                        
+                    self._log(f"      -> Processing product {position}/{len(products)}")
                     try:
-                        fresh_links = self.driver.find_elements(By.CSS_SELECTOR, "div.listing-page a.display-flex")
-                        if i >= len(fresh_links):
-                            break
-                            
-                        link_element = fresh_links[i]
-                        href = link_element.get_attribute('href')
-
-                        if not self._navigate_to_product(link_element, href):
-                            self._log(f"      -> Could not navigate to product")
-                            continue
-
-                        self._close_modal()
-                        product_url = self.driver.current_url
-                        product_details = self._extract_product_details(product_url, search_mode)
+                        product_details, loaded_in_browser = self._visit_product(listing_item['URL'], search_mode)
+                        left_listing = left_listing or loaded_in_browser
+                    except TimeoutException:
+                        left_listing = True
+                        continue
                         
-                        self._log(f"      -> Extracted: {product_details['Product'][:50]}... | Price: {product_details['Price_SAR']} | Qty: {product_details['Total quantity']}")
+                    self._log(f"      -> Extracted: {product_details['Product'][:50]}... | Price: {product_details['Price_SAR']} | Qty: {product_details['Total quantity']}")
 
-                        is_valid, validation_msg = self._is_valid_product(product_details)
-                        if not is_valid:
-                            self._log(f"      -> Validation failed: {validation_msg}")
-                            continue
+                    is_valid, validation_msg = self._is_valid_product(product_details)
+                    if not is_valid:
+                        self._log(f"      -> Validation failed: {validation_msg}")
+                        continue
 
-                        self._log(f"      -> Checking AI relevance...")
-                        if self.relevance_agent.is_relevant(product_details.get('Product'), keyword):
-                            all_found_products.append(product_details)
-                            self._log(f"      -> Product found: {product_details['Product'][:60]}...")
-                        else:
-                            self._log(f"      -> AI rejected product")
+                    self._log(f"      -> Queued for AI validation...")
+                    pipeline.submit(product_details)
 
-                    except (StaleElementReferenceException, ElementClickInterceptedException, TimeoutException):
-                        continue
-                    finally:
-                        try:
-                            self.driver.get(search_page_url)
-                            WebDriverWait(self.driver, 8).until(
-                                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.listing-page a.display-flex"))
-                            )
-                            time.sleep(0.5)
-                        except Exception:
-                            pass
-
-                try:
-                    next_page_button = self.driver.find_element(By.XPATH, "//a[contains(text(), 'Next')]")
-                    self.driver.execute_script("arguments[0].click();", next_page_button)
-                    page_num += 1
-                except NoSuchElementException:
+                if pipeline.drain() or not has_next_page:
                     break
 
-            except TimeoutException:
+                self._go_to_next_listing(search_page_url, next_url, left_listing)
+                page_num += 1
+
+            except (TimeoutException, NoSuchElementException):
                 break
             except Exception as e:
                 self._log(f"    ! Unexpected error: {e}")
-                break
+                pipeline.finish()
+                raise
 
-        return all_found_products
+        return pipeline.finish()
@@ -1,16 +1,35 @@
+import json
 import re
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException
+from bs4 import SoupStrainer
 from urllib.parse import urljoin, quote
-from utils import parse_volume_string
+import config
+from utils import parse_volume_string, make_soup, page_reports_no_results
+from services.validation_pipeline import ValidationPipeline
+from services.page_fetcher import PageFetcher
+from services.candidate_scorer import rank_candidates
+from services.details_cache import get_details_cache
+from services.wait_policy import WaitPolicy
 
 class MumzworldScraper:
+    SEARCH_PAGE_PARSE_ONLY = SoupStrainer('a', attrs={'class': re.compile(r'\bProductCard_productName__Dz1Yx\b')})
+    NEXT_DATA_PATTERN = re.compile(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S)
+    JSON_URL_KEYS = ('url', 'url_key', 'canonical_url', 'slug')
+    JSON_PRICE_KEYS = ('special_price', 'final_price', 'price', 'price_range', 'minimum_price', 'regular_price')
+    JSON_PRICE_VALUE_KEYS = ('value', 'amount')
+    JSON_BRAND_KEYS = ('brand', 'brand_name', 'brand_info', 'manufacturer')
+    JSON_SIZE_KEYS = ('size', 'pack_size', 'volume', 'net_volume', 'capacity')
+    PRODUCT_PAGE_PARSE_ONLY = ['h1', 'span']
+
     def __init__(self, driver, relevance_agent):
         self.driver = driver
         self.relevance_agent = relevance_agent 
         self.base_url = "https://www.mumzworld.com/sa-en/"
+        self.fetcher = PageFetcher(driver, 'mumzworld')
+        self.details_cache = get_details_cache() if config.DETAILS_CACHE_ENABLED else None
+        self.waits = WaitPolicy(driver, 'mumzworld')
 
     def _log(self, msg):
         print(msg)
@@ -27,83 +46,213 @@ class MumzworldScraper:
         quantity = int(match.group(1))
         return {'quantity': quantity, 'unit': 'units', 'normalized': quantity}
 
+    def _parse_quantity(self, product_name, search_mode, size=None):
+        parse = self._parse_mumzworld_count_string if search_mode == 'units' else parse_volume_string
+        parsed_data = (parse(size) if size else None) or parse(product_name)
+        if not parsed_data:
+            return None
+
+        base_quantity = parsed_data['quantity']
+        total_quantity = base_quantity
+        multiplier_match = re.search(r'(?:pack of|x|of)\s*(\d+)', product_name, re.IGNORECASE)
+        if multiplier_match:
+            multiplier = int(multiplier_match.group(1))
+            total_quantity = base_quantity * multiplier
+            self._log(f"      -> Multiplier found: {base_quantity} * {multiplier} = {total_quantity}")
+        self._log(f"      -> Extracted amount: {total_quantity} {parsed_data['unit']}")
+        return total_quantity, parsed_data['unit']
+
+    def _company_from_name(self, product_name):
+        return product_name.split(' - ')[0].strip() if ' - ' in product_name else product_name.split(' ')[0].strip()
+
     def _extract_product_details(self, product_url, search_mode):
+        cached = self.details_cache.get('mumzworld', product_url, search_mode) if self.details_cache else None
+        if cached is not None:
+            self._log(f"      -> Product details (cache): {cached['Product'][:60]}...")
+            return cached
+
         details = {
             'Product': 'Not found', 'Price_SAR': '0.00', 'Company': 'Not found',
             'URL': product_url, 'Unit of measurement': 'units', 'Total quantity': 0
         }
         try:
-            self.driver.get(product_url)
-            WebDriverWait(self.driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1.ProductDetails_productName__lcVK_")))
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+            soup = self.fetcher.fetch(
+                product_url,
+                ["h1.ProductDetails_productName__lcVK_", "span.Price_integer__3ngZQ"],
+                EC.presence_of_element_located((By.CSS_SELECTOR, "h1.ProductDetails_productName__lcVK_")),
+                timeout=15,
+                parse_only=self.PRODUCT_PAGE_PARSE_ONLY
+            )
 
             product_name_tag = soup.find('h1', class_='ProductDetails_productName__lcVK_')
             product_name = self._safe_get_text(product_name_tag)
             if product_name:
                 details['Product'] = product_name
-                details['Company'] = product_name.split(' - ')[0].strip() if ' - ' in product_name else product_name.split(' ')[0].strip()
-
-                parsed_data = self._parse_mumzworld_count_string(product_name) if search_mode == 'units' else parse_volume_string(product_name)
-                if parsed_data:
-                    base_quantity = parsed_data['quantity']
-                    multiplier_match = re.search(r'(?:pack of|x|of)\s*(\d+)', product_name, re.IGNORECASE)
-                    if multiplier_match:
-                        multiplier = int(multiplier_match.group(1))
-                        details['Total quantity'] = base_quantity * multiplier
-                        self._log(f"      -> Multiplier found: {base_quantity} * {multiplier} = {details['Total quantity']}")
-                    else:
-                        details['Total quantity'] = base_quantity
-                    details['Unit of measurement'] = parsed_data['unit']
-                    self._log(f"      -> Extracted amount: {details['Total quantity']} {parsed_data['unit']}")
+                details['Company'] = self._company_from_name(product_name)
+
+                quantity = self._parse_quantity(product_name, search_mode)
+                if quantity:
+                    details['Total quantity'], details['Unit of measurement'] = quantity
 
             price_tag = soup.find('span', class_='Price_integer__3ngZQ')
             if price_tag:
                 details['Price_SAR'] = self._safe_get_text(price_tag).replace(',', '')
         except Exception as e:
             self._log(f"      ! Error extracting details from {product_url}: {e}")
+            return details
+
+        if self.details_cache and details['Product'] != 'Not found':
+            self.details_cache.put('mumzworld', product_url, search_mode, details)
         return details
 
+    def _walk_json(self, node, parent=None):
+        if isinstance(node, dict):
+            if self._is_json_product(node):
+                yield id(parent), node
+                return
+            for value in node.values():
+                yield from self._walk_json(value, node)
+        elif isinstance(node, list):
+            for value in node:
+                yield from self._walk_json(value, node)
+
+    def _is_json_product(self, node):
+        return (isinstance(node.get('name'), str) and
+                any(isinstance(node.get(key), str) for key in self.JSON_URL_KEYS) and
+                any(key in node for key in self.JSON_PRICE_KEYS))
+
+    def _json_price(self, node, depth=0):
+        if isinstance(node, bool):
+            return None
+        if isinstance(node, (int, float)):
+            return float(node) if node > 0 else None
+        if isinstance(node, str):
+            match = re.search(r'\d[\d,]*(?:\.\d+)?', node)
+            return self._json_price(float(match.group(0).replace(',', '')), depth) if match else None
+        if isinstance(node, dict) and depth < 4:
+            for key in self.JSON_PRICE_KEYS + (self.JSON_PRICE_VALUE_KEYS if depth else ()):
+                price = self._json_price(node.get(key), depth + 1)
+                if price:
+                    return price
+        return None
+
+    def _json_text(self, node, keys, allow_numbers=False):
+        for key in keys:
+            value = node.get(key)
+            if isinstance(value, dict):
+                value = value.get('name') or value.get('label')
+            # Sizes can be bare numbers; a numeric brand is an ID, not a name.
+            if allow_numbers and isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+        return None
+
+    def _embedded_products(self, page_source):
+        match = self.NEXT_DATA_PATTERN.search(page_source)
+        if not match:
+            return []
+        try:
+            page_data = json.loads(match.group(1))
+        except ValueError:
+            return []
+
+        products = []
+        for group, node in self._walk_json(page_data):
+            price = self._json_price(node)
+            url = next(node[key] for key in self.JSON_URL_KEYS if isinstance(node.get(key), str))
+            products.append({
+                'URL': urljoin(self.base_url, url),
+                'Product': node['name'].strip(),
+                'Company': self._json_text(node, self.JSON_BRAND_KEYS),
+                'Price_SAR': f"{price:.2f}" if price else None,
+                'Size': self._json_text(node, self.JSON_SIZE_KEYS, allow_numbers=True),
+                'Group': group
+            })
+        return products
+
+    def _listing_products(self, page_source):
+        embedded = self._embedded_products(page_source) if config.MUMZWORLD_EMBEDDED_DATA_ENABLED else []
+        by_name = {' '.join(item['Product'].lower().split()): item for item in embedded}
+
+        listing_products = []
+        for link_tag in make_soup(page_source, self.SEARCH_PAGE_PARSE_ONLY).find_all('a', href=True):
+            card_name = link_tag.get_text(" ", strip=True)
+            item = by_name.pop(' '.join(card_name.lower().split()), None) or {'Product': card_name}
+            item['URL'] = urljoin(self.base_url, link_tag['href'])
+            listing_products.append(item)
+        if not listing_products and embedded:
+            # Without cards to match against, the search results are the largest list of products;
+            # recommendation and recently-viewed widgets hold only a handful.
+            group_sizes = {}
+            for item in embedded:
+                group_sizes[item['Group']] = group_sizes.get(item['Group'], 0) + 1
+            largest_group = max(group_sizes, key=group_sizes.get)
+            listing_products = [item for item in embedded if item['Group'] == largest_group]
+        self._log(f"    > {len(embedded)} products in embedded page data, {len(listing_products)} candidates in total.")
+        return listing_products
+
+    def _details_from_listing(self, item, search_mode):
+        if not item.get('Price_SAR'):
+            return None
+        quantity = self._parse_quantity(item['Product'], search_mode, item.get('Size'))
+        if not quantity:
+            return None
+        return {
+            'Product': item['Product'], 'Price_SAR': item['Price_SAR'],
+            'Company': item.get('Company') or self._company_from_name(item['Product']),
+            'URL': item['URL'], 'Unit of measurement': quantity[1], 'Total quantity': quantity[0]
+        }
+
     def scrape(self, keyword, search_mode):
         self._log(f"  [Mumzworld Scraper] Searching: '{keyword}' (Mode: {search_mode})")
         search_url = f"{self.base_url}search?q={quote(keyword)}"
-        valid_products_found = []
         products_to_find = 2
+        pipeline = ValidationPipeline(self.relevance_agent, keyword, products_to_find, self._log)
 
         try:
             self._log(f"    > Navigating to: {search_url}")
             self.driver.get(search_url)
-            WebDriverWait(self.driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.ProductCard_productCard__kFgss")))
+            # Either the cards or the embedded page data is enough to start; the card wait below covers the rest.
+            self.waits.selector_present("div.ProductCard_productCard__kFgss, script#__NEXT_DATA__", timeout=15)
+            listing_products = self._listing_products(self.driver.page_source)
+            if not listing_products:
+                try:
+                    self.waits.require_selector("div.ProductCard_productCard__kFgss")
+                except TimeoutException:
+                    if not page_reports_no_results(self.driver.page_source):
+                        raise
+                    self._log("    > Mumzworld reports no results for this search.")
+                    return pipeline.finish()
+                listing_products = self._listing_products(self.driver.page_source)
             self._log("    > Search results page loaded. Analyzing products...")
 
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            product_containers = soup.select("div.ProductCard_productCard__kFgss")
-
-            if not product_containers:
+            if not listing_products:
                 self._log("    ! Warning: No product containers found.")
-                return []
+                return pipeline.finish()
+
+            listing_products = rank_candidates(listing_products, keyword, search_mode, log=self._log)
 
-            for container in product_containers:
-                if len(valid_products_found) >= products_to_find:
+            for listing_item in listing_products:
+                if pipeline.throttle():
                     self._log(f"    > Limit of {products_to_find} VALID products reached.")
                     break
 
-                link_tag = container.find('a', class_='ProductCard_productName__Dz1Yx')
-                if link_tag and link_tag.has_attr('href'):
-                    product_url = urljoin(self.base_url, link_tag['href'])
-                    self._log(f"      -> Visiting: {product_url[:80]}...")
-                    product_details = self._extract_product_details(product_url, search_mode)
-
-                    if product_details.get('Total quantity', 0) > 0:
-                        is_relevant = self.relevance_agent.is_relevant(product_details.get('Product'), keyword)
-                        
-                        if is_relevant:
-                            valid_products_found.append(product_details)
-                            self._log(f"      -> VALID. Extracted: {product_details['Product'][:60]}...")
-                        else:
-                            self._log(f"      -> DISCARDED (Not relevant by AI): {product_details['Product'][:60]}...")
-                    else:
-                        self._log(f"      -> DISCARDED (no quantity): {product_details['Product'][:60]}...")
+                product_details = self._details_from_listing(listing_item, search_mode)
+                if product_details is not None:
+                    self._log(f"      -> From search page: {product_details['Product'][:60]}...")
+                else:
+                    self._log(f"      -> Visiting: {listing_item['URL'][:80]}...")
+                    product_details = self._extract_product_details(listing_item['URL'], search_mode)
+
+                if product_details.get('Total quantity', 0) > 0:
+                    self._log(f"      -> Queued for AI validation: {product_details['Product'][:60]}...")
+                    pipeline.submit(product_details)
+                else:
+                    self._log(f"      -> DISCARDED (no quantity): {product_details['Product'][:60]}...")
         except Exception as e:
             self._log(f"    ! Unexpected error occurred in Mumzworld scraper: {e}")
+            pipeline.finish()
+            raise
 
-        return valid_products_found
\ No newline at end of file
+        return pipeline.finish()
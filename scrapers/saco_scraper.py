@@ -1,37 +1,118 @@
-import time
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, ElementClickInterceptedException, InvalidSessionIdException, NoSuchElementException
-from bs4 import BeautifulSoup
-from urllib.parse import quote
-from utils import parse_volume_string, parse_count_string, parse_saco_count_string
+from selenium.common.exceptions import TimeoutException, InvalidSessionIdException, NoSuchElementException
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urljoin
+import config
+from utils import parse_volume_string, parse_count_string, parse_saco_count_string, make_soup, page_reports_no_results
+from services.validation_pipeline import ValidationPipeline
+from services.candidate_scorer import rank_candidates
+from services.details_cache import get_details_cache
+from services.wait_policy import WaitPolicy
+from services.page_fetcher import PageFetcher
 
 class SacoScraper:
+    PRODUCT_PAGE_PARSE_ONLY = ['h1', 'span', 'ul']
+    LISTING_PARSE_ONLY = ['div', 'a']
+
     def __init__(self, driver, relevance_agent):
         self.driver = driver
         self.relevance_agent = relevance_agent
         self.base_url = "https://www.saco.sa/en/"
+        self.details_cache = get_details_cache() if config.DETAILS_CACHE_ENABLED else None
+        self.waits = WaitPolicy(driver, 'saco')
+        self.fetcher = PageFetcher(driver, 'saco')
+        # Runs on the prefetch thread; kept apart so listing pages do not steer the product fetcher's tab decisions or stats.
+        self.listing_fetcher = PageFetcher(driver, 'saco', stats_label='saco listings')
 
     def _log(self, msg):
         print(msg)
 
     def _handle_overlays(self):
-        try:
-            cookie_accept_button = WebDriverWait(self.driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Accept')]"))
-            )
-            self._log("    > Cookie banner detected. Clicking 'Accept'.")
-            self.driver.execute_script("arguments[0].click();", cookie_accept_button)
-            time.sleep(2)
-        except TimeoutException:
+        cookie_locator = (By.XPATH, "//button[contains(text(), 'Accept')]")
+        if not self.waits.clickable(cookie_locator, timeout=5):
             self._log("    > No cookie banner detected. Continuing.")
-            pass
-
-    def _extract_product_details(self, product_url, search_mode):
+            return
+        cookie_accept_button = self.driver.find_element(*cookie_locator)
+        self._log("    > Cookie banner detected. Clicking 'Accept'.")
+        self.driver.execute_script("arguments[0].click();", cookie_accept_button)
+        self.waits.gone(cookie_accept_button)
+
+    def _harvest_listing(self, soup, page_url):
+        products = []
+        for container in soup.select("div.product-inner-container"):
+            link = container.select_one("p.product-name a[href]")
+            title = link.get_text(" ", strip=True) if link else ''
+            if not title:
+                continue
+            price_tag = container.select_one("span.discount-price")
+            products.append({
+                'URL': urljoin(page_url, link['href']),
+                'Product': title,
+                'Price_SAR': price_tag.get_text(separator='.', strip=True) if price_tag else '0.00'
+            })
+
+        next_link = soup.select_one("a.next")
+        next_url = None
+        if next_link is not None:
+            href = next_link.get('href', '')
+            if href and not href.startswith(('#', 'javascript')):
+                next_url = urljoin(page_url, href)
+        return products, next_link is not None, next_url
+
+    def _page_url(self, search_url, page_num):
+        if config.SACO_PAGE_URL_TEMPLATE:
+            return config.SACO_PAGE_URL_TEMPLATE.format(search_url=search_url, page=page_num)
+        return None
+
+    def _load_listing(self, url):
+        self.driver.get(url)
+        self.waits.require_selector("div.product-inner-container")
+        self.waits.network_idle()
+        return make_soup(self.driver.page_source, self.LISTING_PARSE_ONLY)
+
+    def _prefetch_listing(self, url):
+        return self.listing_fetcher.fetch_http(url, ["div.product-inner-container p.product-name a[href]"], self.LISTING_PARSE_ONLY)
+
+    def _click_to_next_listing(self, page_url):
+        self._log("    > No next page URL. Returning to the listing to click 'Next'...")
+        self._load_listing(page_url)
+        next_page_button = self.driver.find_element(By.CSS_SELECTOR, "a.next")
+        self.driver.execute_script("arguments[0].click();", next_page_button)
+        self.waits.url_changes(page_url)
+        if self.driver.current_url == page_url:
+            return None
+        self.waits.require_selector("div.product-inner-container")
+        self.waits.network_idle()
+        return make_soup(self.driver.page_source, self.LISTING_PARSE_ONLY)
+
+    def _is_cached(self, product_url, search_mode):
+        return bool(self.details_cache) and self.details_cache.contains('saco', product_url, search_mode)
+
+    def _visit_product(self, listing_item, search_mode):
+        product_url = listing_item['URL']
+        cached_details = self.details_cache.get('saco', product_url, search_mode) if self.details_cache else None
+        if cached_details is not None:
+            self._log(f"      -> Product details (cache): {cached_details['Product'][:60]}...")
+            return cached_details
+
+        soup = self.fetcher.fetch(
+            product_url,
+            ["h1.product-title", "ul.details-box li label"],
+            EC.presence_of_element_located((By.CSS_SELECTOR, "h1.product-title")),
+            timeout=15,
+            parse_only=self.PRODUCT_PAGE_PARSE_ONLY
+        )
+        product_details = self._extract_product_details(product_url, search_mode, soup)
+        if product_details['Price_SAR'] == '0.00':
+            product_details['Price_SAR'] = listing_item['Price_SAR']
+        if self.details_cache and product_details['Product'] != 'Not found':
+            self.details_cache.put('saco', product_url, search_mode, product_details)
+        return product_details
+
+    def _extract_product_details(self, product_url, search_mode, soup):
         self._log(f"        -> Extracting details from: {product_url}")
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-        
+
         details = {
             'Product': 'Not found', 'Price_SAR': '0.00', 'Company': 'Brand not found',
             'URL': product_url, 'Unit of measurement': 'units', 'Total quantity': 0
@@ -75,119 +156,94 @@ class SacoScraper:
         search_keyword = quote(keyword)
         search_url = f"{self.base_url}search/{search_keyword}"
         
-        all_found_products = []
         page_num = 1
         products_to_find_limit = 2
-
-        self.driver.get(search_url)
-        self._handle_overlays()
+        pipeline = ValidationPipeline(self.relevance_agent, keyword, products_to_find_limit, self._log)
+        prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='saco-prefetch') if config.SACO_PREFETCH_NEXT_PAGE else None
 
         try:
-            WebDriverWait(self.driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.product-inner-container"))
-            )
-        except TimeoutException:
-            self._log("    > No product containers found on the initial page. Skipping keyword.")
-            return []
-
-        while len(all_found_products) < products_to_find_limit:
-            self._log(f"--- Analyzing Page {page_num} ---")
-            
-            search_page_url = self.driver.current_url
-            time.sleep(5)
-
-            
-            product_containers = self.driver.find_elements(By.CSS_SELECTOR, "div.product-inner-container")
-            num_containers = len(product_containers)
-
-            if num_containers == 0:
-                self._log("    ! No products containers found on this page.")
-                break
-
-            self._log(f"    > Found {num_containers} product containers on this page.")
-
-            
-            for i in range(num_containers):
-                if len(all_found_products) >= products_to_find_limit:
+            self.driver.get(search_url)
+            self._handle_overlays()
+            try:
+                self.waits.require_selector("div.product-inner-container")
+            except TimeoutException:
+                if not page_reports_no_results(self.driver.page_source):
+                    raise
+                self._log("    > No product containers found on the initial page. Skipping keyword.")
+                return pipeline.finish()
+            self.waits.network_idle()
+            page_url = self.driver.current_url
+            listing_soup = make_soup(self.driver.page_source, self.LISTING_PARSE_ONLY)
+
+            while not pipeline.is_satisfied():
+                self._log(f"--- Analyzing Page {page_num} ---")
+                products, has_next_page, next_url = self._harvest_listing(listing_soup, page_url)
+
+                if not products:
+                    self._log("    ! No products containers found on this page.")
                     break
-                try:
-                    
-                    current_containers = self.driver.find_elements(By.CSS_SELECTOR, "div.product-inner-container")
-                    if i >= len(current_containers):
-                        break
-                    
-                    container = current_containers[i]
 
-                    
+                self._log(f"    > Found {len(products)} products on this page.")
+                if has_next_page and not next_url:
+                    next_url = self._page_url(search_url, page_num + 1)
+                prefetched = prefetcher.submit(self._prefetch_listing, next_url) if prefetcher and next_url else None
+
+                ranked_products = rank_candidates(products, keyword, search_mode, log=self._log)
+                page_urls = [item['URL'] for item in ranked_products if not self._is_cached(item['URL'], search_mode)]
+                for position, listing_item in enumerate(ranked_products, start=1):
+                    if pipeline.throttle():
+                        break
+                    self._log(f"      -> Processing product {position}/{len(products)}...")
+                    if listing_item['URL'] in page_urls:
+                        self.fetcher.prefetch(listing_item['URL'], page_urls[page_urls.index(listing_item['URL']) + 1:])
                     try:
-                        product_link = container.find_element(By.CSS_SELECTOR, "p.product-name a")
-                        if not product_link.text.strip():
-                            self._log(f"      -> Skipping empty product container #{i+1}.")
-                            continue 
-                    except NoSuchElementException:
-                        self._log(f"      -> Skipping container #{i+1} (no product link found inside).")
-                        continue 
-
-                    self._log(f"      -> Processing product {i+1}/{num_containers}...")
-                    
-                    self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", product_link)
-                    time.sleep(1)
-                    product_link.click()
-
-                    WebDriverWait(self.driver, 15).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "h1.product-title"))
-                    )
-                    
-                    product_url = self.driver.current_url
-                    product_details = self._extract_product_details(product_url, search_mode)
-                    
-                    if product_details and product_details.get('Total quantity', 0) > 0:
-                        is_relevant = self.relevance_agent.is_relevant(product_details.get('Product'), keyword)
-                        if is_relevant:
-                            all_found_products.append(product_details)
-                            self._log(f"      -> AI VALIDATED. Product saved: {product_details['Product'][:60]}...")
-                        else:
-                            self._log(f"      -> DISCARDED BY AI (Not relevant): {product_details['Product'][:60]}...")
+                        product_details = self._visit_product(listing_item, search_mode)
+                    except TimeoutException as e:
+                        self._log(f"      -> WARNING: Could not process product {position}. Skipping. Reason: {type(e).__name__}")
+                        continue
+                    except InvalidSessionIdException:
+                        self._log(f"      -> FATAL ERROR: Browser session lost. Aborting scrape for '{keyword}'.")
+                        raise
+
+                    if product_details.get('Total quantity', 0) > 0:
+                        self._log(f"      -> Queued for AI validation: {product_details['Product'][:60]}...")
+                        pipeline.submit(product_details)
                     else:
                         self._log(f"      -> DISCARDED (no quantity): {product_details.get('Product', 'N/A')[:60]}...")
 
-                    self.driver.get(search_page_url)
-                    WebDriverWait(self.driver, 20).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "div.product-inner-container"))
-                    )
-                    time.sleep(2)
-
-                except (TimeoutException, StaleElementReferenceException, ElementClickInterceptedException) as e:
-                    self._log(f"      -> WARNING: Could not process product {i+1}. Skipping. Reason: {type(e).__name__}")
-                    self.driver.get(search_page_url)
-                    WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.product-inner-container")))
-                    continue
-                except InvalidSessionIdException:
-                    self._log(f"      -> FATAL ERROR: Browser session lost. Aborting scrape for '{keyword}'.")
-                    return all_found_products
-            
-            if len(all_found_products) >= products_to_find_limit:
-                self._log(f"    > Target of {products_to_find_limit} products reached.")
-                break
-            
-            try:
-                current_page_url = self.driver.current_url
-                next_page_button = self.driver.find_element(By.CSS_SELECTOR, "a.next")
-                self._log("    > Next page button found. Attempting to navigate...")
-                
-                self.driver.execute_script("arguments[0].click();", next_page_button)
-                time.sleep(3)
-
-                if self.driver.current_url == current_page_url:
-                    self._log("    > URL did not change. Reached the last page.")
+                if pipeline.drain():
+                    self._log(f"    > Target of {products_to_find_limit} products reached.")
+                    break
+
+                if not has_next_page:
+                    self._log("    > No more pages found. Ending pagination.")
                     break
-                else:
-                    page_num += 1
-                    self._log("    > Successfully navigated to the next page.")
 
-            except:
-                self._log("    > No more pages found. Ending pagination.")
-                break
+                try:
+                    listing_soup = prefetched.result() if prefetched else None
+                    if listing_soup is not None:
+                        self._log("    > Using prefetched next page.")
+                    elif next_url:
+                        listing_soup = self._load_listing(next_url)
+                    else:
+                        listing_soup = self._click_to_next_listing(page_url)
+                except (TimeoutException, NoSuchElementException):
+                    listing_soup = None
 
+                if listing_soup is None:
+                    self._log("    > Could not load the next page. Ending pagination.")
+                    break
+                page_url = next_url or self.driver.current_url
+                page_num += 1
+                self._log("    > Successfully navigated to the next page.")
+        except Exception:
+            pipeline.finish()
+            raise
+        finally:
+            if prefetcher:
+                prefetcher.shutdown(wait=False, cancel_futures=True)
+            self.fetcher.close_tabs()
+
+        all_found_products = pipeline.finish()
         self._log(f"\n  [Saco Scraper] Finished scraping. Found data for {len(all_found_products)} products.")
-        return all_found_products
\ No newline at end of file
+        return all_found_products
@@ -1,21 +1,58 @@
 import os
 import json
+import hashlib
+import asyncio
+import threading
+import weakref
 import requests
-import time 
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+import config
+from services.verdict_cache import get_verdict_cache, normalize_title
+from services.title_index import get_title_index
+from services.rate_limiter import get_rate_limiter, parse_retry_after
 
 class RelevanceAgent:
-    def __init__(self):
+    def __init__(self, offline=False):
         load_dotenv()
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
+        self.api_key = None if offline else os.getenv("GEMINI_API_KEY")
+        if offline:
+            print("AI agent running offline: only cached verdicts will be used")
+        elif not self.api_key:
             print("API KEY not found")
 
-        self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent?key={self.api_key}"
+        self.model_name = "gemini-2.5-flash-lite"
+        self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model_name}:generateContent?key={self.api_key}"
         self.headers = {'Content-Type': 'application/json'}
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.AI_MAX_IN_FLIGHT)
+        self.session.mount('https://', adapter)
+        self.timeout = (config.AI_CONNECT_TIMEOUT_SECONDS, config.AI_READ_TIMEOUT_SECONDS)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Weak keys, so a finished event loop is not kept alive by its semaphore.
+        self._async_semaphores = weakref.WeakKeyDictionary()
+        self.prompt_version = hashlib.sha1(self._get_prompt('{product_name}', '{search_query}').encode('utf-8')).hexdigest()[:12]
+        self.verdict_cache = get_verdict_cache()
+        self.rate_limiter = get_rate_limiter(self.model_name)
+        self.title_index = get_title_index() if config.TITLE_INDEX_ENABLED else None
+        self.local_model = self._load_local_model()
 
-    def _get_prompt(self, product_name, search_query):
-        return f"""
+    def _load_local_model(self):
+        if not config.RELEVANCE_MODEL_ENABLED:
+            return None
+        # Imported here so runs without the local model never load sklearn and joblib.
+        from services.relevance_model import get_relevance_model
+        model = get_relevance_model()
+        if model is not None and model.prompt_version != self.prompt_version:
+            print(f"Local relevance model was trained for prompt {model.prompt_version}, current prompt is {self.prompt_version}. Ignoring it.")
+            return None
+        return model
+
+    def _get_guidelines(self):
+        return """
         You are a highly precise expert shopping assistant. Your task is to determine if a product title is a relevant and specific match for a user's search query. Your decisions must be strict.
 
         --- RULES ---
@@ -77,7 +114,10 @@ class RelevanceAgent:
         No
 
         --- END EXAMPLES ---
+"""
 
+    def _get_prompt(self, product_name, search_query):
+        return self._get_guidelines() + f"""
         --- CURRENT TASK ---
         User Search Query: "{search_query}"
         Product Title: "{product_name}"
@@ -85,45 +125,206 @@ class RelevanceAgent:
         Is the product a relevant match for the query?
         """
 
+    def _get_batch_prompt(self, product_names, search_query):
+        numbered_titles = "\n".join(f'        {i}. "{name}"' for i, name in enumerate(product_names, start=1))
+        return self._get_guidelines() + f"""
+        --- CURRENT TASK ---
+        Apply the same rules to EACH of the following product titles independently.
+        Ignore the "Yes" or "No" response format above and instead respond with only a JSON array of
+        exactly {len(product_names)} strings, each "Yes" or "No", in the same order as the titles.
+
+        User Search Query: "{search_query}"
+        Product Titles:
+{numbered_titles}
+        """
+
+    def _parse_batch_decisions(self, text, expected_count):
+        cleaned = text.strip()
+        if cleaned.startswith("```"):
+            cleaned = cleaned.strip("`")
+            if cleaned.lower().startswith("json"):
+                cleaned = cleaned[4:]
+        try:
+            decisions = json.loads(cleaned)
+        except ValueError:
+            return None
+        if not isinstance(decisions, list) or len(decisions) != expected_count:
+            return None
+        parsed = []
+        for decision in decisions:
+            if isinstance(decision, bool):
+                parsed.append(decision)
+            elif isinstance(decision, str) and decision.strip().lower() in ("yes", "no"):
+                parsed.append(decision.strip().lower() == "yes")
+            else:
+                return None
+        return parsed
+
+    def _index_namespace(self, search_query):
+        return f"{self.prompt_version}\x1f{normalize_title(search_query)}"
+
+    def _remember(self, product_name, search_query, decision):
+        if self.title_index is not None:
+            self.title_index.add(product_name, self._index_namespace(search_query), decision)
+
+    def _near_duplicate_decision(self, product_name, search_query):
+        if self.title_index is None:
+            return None
+        match = self.title_index.lookup(product_name, self._index_namespace(search_query))
+        if match is None:
+            return None
+        decision, matched_title, similarity = match
+        print(f"      -> IA decision (near-duplicate {similarity:.2f} of '{matched_title[:50]}'): {'yes' if decision else 'no'}")
+        return decision
+
     def is_relevant(self, product_name, search_query):
+        cached = self.verdict_cache.get(product_name, search_query, self.prompt_version)
+        if cached is not None:
+            print(f"      -> IA decision (cache): {'yes' if cached else 'no'}")
+            self._remember(product_name, search_query, cached)
+            return cached
+
+        near_duplicate = self._near_duplicate_decision(product_name, search_query)
+        if near_duplicate is not None:
+            return near_duplicate
+
+        if self.local_model is not None:
+            local_decision = self.local_model.decide(product_name, search_query)
+            if local_decision is not None:
+                print(f"      -> IA decision (local model): {'yes' if local_decision else 'no'}")
+                return local_decision
+
         if not self.api_key:
-            return False 
+            return False
+
+        return self._judge_uncached(product_name, search_query)
+
+    def _judge_uncached(self, product_name, search_query):
+        decision = self._request_decision(product_name, search_query)
+        if decision is None:
+            return False
+
+        self.verdict_cache.put(product_name, search_query, self.prompt_version, decision)
+        self._remember(product_name, search_query, decision)
+        return decision
+
+    def _request_decision(self, product_name, search_query):
+        text = self._generate(self._get_prompt(product_name, search_query))
+        if text is None:
+            return None
+        decision = text.strip().lower()
+        print(f"      -> IA decision: {decision}")
+        return "yes" in decision
+
+    def submit(self, product_name, search_query):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=config.AI_MAX_IN_FLIGHT, thread_name_prefix='relevance')
+        return self._executor.submit(self.is_relevant, product_name, search_query)
+
+    async def ais_relevant(self, product_name, search_query):
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(config.AI_MAX_IN_FLIGHT)
+        async with semaphore:
+            return await asyncio.to_thread(self.is_relevant, product_name, search_query)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def is_relevant_many(self, product_names, search_query):
+        decisions = [None] * len(product_names)
+        uncached = []
+        for i, product_name in enumerate(product_names):
+            decisions[i] = self.verdict_cache.get(product_name, search_query, self.prompt_version)
+            if decisions[i] is None:
+                uncached.append(i)
+            else:
+                self._remember(product_name, search_query, decisions[i])
+
+        if len(product_names) - len(uncached):
+            print(f"      -> IA decisions (cache): {len(product_names) - len(uncached)}/{len(product_names)}")
+
+        for i in uncached:
+            decisions[i] = self._near_duplicate_decision(product_names[i], search_query)
+        uncached = [i for i in uncached if decisions[i] is None]
+
+        if uncached and self.local_model is not None:
+            local_decisions = self.local_model.decide_many([product_names[i] for i in uncached], search_query)
+            for i, local_decision in zip(uncached, local_decisions):
+                decisions[i] = local_decision
+            decided_locally = len(uncached) - local_decisions.count(None)
+            uncached = [i for i in uncached if decisions[i] is None]
+            if decided_locally:
+                print(f"      -> IA decisions (local model): {decided_locally}/{len(product_names)}")
+
+        if uncached and not self.api_key:
+            return [bool(decision) for decision in decisions]
+
+        for chunk_start in range(0, len(uncached), config.AI_BATCH_SIZE):
+            chunk = uncached[chunk_start:chunk_start + config.AI_BATCH_SIZE]
+            if len(chunk) == 1:
+                decisions[chunk[0]] = self._judge_uncached(product_names[chunk[0]], search_query)
+                continue
+
+            chunk_names = [product_names[i] for i in chunk]
+            text = self._generate(self._get_batch_prompt(chunk_names, search_query), {"responseMimeType": "application/json"})
+            chunk_decisions = self._parse_batch_decisions(text, len(chunk)) if text is not None else None
+
+            if chunk_decisions is None:
+                print(f"      -> Could not parse batch AI response. Falling back to {len(chunk)} single requests.")
+                for i in chunk:
+                    decisions[i] = self._judge_uncached(product_names[i], search_query)
+                continue
+
+            print(f"      -> IA batch decision: {sum(chunk_decisions)}/{len(chunk)} relevant")
+            for i, decision in zip(chunk, chunk_decisions):
+                decisions[i] = decision
+                self.verdict_cache.put(product_names[i], search_query, self.prompt_version, decision)
+                self._remember(product_names[i], search_query, decision)
+
+        return [bool(decision) for decision in decisions]
 
-        prompt = self._get_prompt(product_name, search_query)
+    def _generate(self, prompt, generation_config=None):
         chat_history = [{"role": "user", "parts": [{"text": prompt}]}]
         payload = {"contents": chat_history}
+        if generation_config:
+            payload["generationConfig"] = generation_config
         
-        max_retries = 3
+        estimated_tokens = len(prompt) // 4 + config.AI_ESTIMATED_OUTPUT_TOKENS
+        max_retries = config.AI_MAX_RETRIES
         for attempt in range(max_retries):
             try:
-                response = requests.post(self.api_url, headers=self.headers, data=json.dumps(payload))
+                self.rate_limiter.acquire(estimated_tokens)
+                response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
                 
                 if response.status_code == 429:
-                    print("      -> Rate limit hit. Waiting for 60 seconds to reset...")
-                    time.sleep(60)
+                    delay = self.rate_limiter.backoff(attempt, parse_retry_after(response))
+                    print(f"      -> Rate limit hit. Backing off for {delay:.1f} seconds... (Attempt {attempt + 1}/{max_retries})")
                     continue 
 
                 response.raise_for_status()
                 result = response.json()
 
                 if result.get('candidates'):
-                    decision = result['candidates'][0]['content']['parts'][0]['text'].strip().lower()
-                    print(f"      -> IA decision: {decision}")
-                    return "yes" in decision
+                    return result['candidates'][0]['content']['parts'][0]['text']
                 else:
                     print("      -> No candidates found in AI response.")
-                    return False
+                    return None
 
             except requests.exceptions.RequestException as e:
                 print(f"      -> Network error contacting AI agent: {e}")
                 if attempt < max_retries - 1:
-                    print(f"      -> Retrying in 10 seconds... (Attempt {attempt + 1}/{max_retries})")
-                    time.sleep(10)
+                    delay = self.rate_limiter.backoff(attempt, parse_retry_after(getattr(e, 'response', None)))
+                    print(f"      -> Retrying in {delay:.1f} seconds... (Attempt {attempt + 1}/{max_retries})")
                 else:
-                    return False 
+                    return None
             except Exception as e:
                 print(f"      -> Unexpected error processing AI response: {e}")
-                return False
+                return None
         
         print("      -> Failed to get a valid response from AI after multiple retries.")
-        return False
\ No newline at end of file
+        return None
@@ -0,0 +1,69 @@
+import re
+import config
+from utils import parse_volume_string, parse_count_string
+
+STOPWORDS = {'for', 'and', 'the', 'of', 'with', 'a', 'an', 'in', 'to', 'on', 'by'}
+
+TOOL_WORDS = {
+    'brush', 'cloth', 'sponge', 'mop', 'wipe', 'towel', 'scrubber', 'duster', 'microfiber',
+    'microfibre', 'rag', 'pad', 'glove', 'squeegee', 'bucket', 'broom', 'sprayer', 'dispenser'
+}
+
+AUTOMOTIVE_WORDS = {'car', 'vehicle', 'auto', 'automotive', 'motor', 'tyre', 'tire', 'wheel', 'dashboard'}
+
+def _stem(token):
+    for suffix in ('ing', 'ers', 'er', 'es', 's'):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix == 'es' and not token[:-2].endswith(('sh', 'ch', 'x', 'ss')):
+                continue
+            return token[:-len(suffix)]
+    return token
+
+def tokenize(text):
+    return {_stem(token) for token in re.findall(r'[a-z0-9]+', str(text or '').lower()) if token not in STOPWORDS}
+
+TOOL_TERMS = {_stem(word) for word in TOOL_WORDS}
+AUTOMOTIVE_TERMS = {_stem(word) for word in AUTOMOTIVE_WORDS}
+
+def score_candidate(title, query, search_mode):
+    title_tokens = tokenize(title)
+    query_tokens = tokenize(query)
+    if not title_tokens or not query_tokens:
+        return 0.0, 'empty title'
+
+    score = len(title_tokens & query_tokens) / len(query_tokens)
+    reasons = [f"overlap {score:.2f}"]
+
+    if title_tokens & TOOL_TERMS and not query_tokens & TOOL_TERMS:
+        score -= config.CANDIDATE_TOOL_PENALTY
+        reasons.append('tool for a non-tool query')
+
+    query_is_automotive = bool(query_tokens & AUTOMOTIVE_TERMS)
+    title_is_automotive = bool(title_tokens & AUTOMOTIVE_TERMS)
+    if query_is_automotive != title_is_automotive:
+        score -= config.CANDIDATE_AUTOMOTIVE_PENALTY
+        reasons.append('automotive mismatch')
+
+    quantity = parse_count_string(title) if search_mode == 'units' else parse_volume_string(title)
+    if quantity:
+        score += config.CANDIDATE_QUANTITY_BONUS
+        reasons.append('quantity in title')
+
+    return score, ', '.join(reasons)
+
+def rank_candidates(candidates, query, search_mode, title_of=None, log=print):
+    if not config.CANDIDATE_SCORING:
+        return list(candidates)
+
+    title_of = title_of or (lambda candidate: candidate.get('Product'))
+    scored = []
+    for position, candidate in enumerate(candidates):
+        title = title_of(candidate)
+        score, reason = score_candidate(title, query, search_mode)
+        if score < config.CANDIDATE_MIN_SCORE:
+            log(f"      -> DROPPED by lexical score {score:.2f} ({reason}): {str(title)[:60]}...")
+            continue
+        scored.append((score, position, candidate))
+
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [candidate for _, _, candidate in scored]
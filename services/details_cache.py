@@ -0,0 +1,83 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urldefrag
+import config
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+def canonical_url(url):
+    url = urldefrag(str(url or ''))[0]
+    asin_match = re.search(r'/(?:dp|gp/product)/([A-Z0-9]{10})(?:[/?]|$)', unquote(url))
+    if asin_match:
+        return f"asin:{asin_match.group(1)}"
+    return url
+
+class DetailsCache:
+    def __init__(self, path=None, ttl_hours=None):
+        self.path = path or config.DETAILS_CACHE_FILE
+        self.ttl_seconds = (ttl_hours if ttl_hours is not None else config.DETAILS_CACHE_TTL_HOURS) * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS product_details (
+                site TEXT,
+                url_key TEXT,
+                search_mode TEXT,
+                details TEXT,
+                created_at REAL,
+                PRIMARY KEY (site, url_key, search_mode)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, site, url, search_mode):
+        key = (site, canonical_url(url), search_mode)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT details, created_at FROM product_details WHERE site = ? AND url_key = ? AND search_mode = ?", key
+            ).fetchone()
+            if row and self.ttl_seconds and time.time() - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM product_details WHERE site = ? AND url_key = ? AND search_mode = ?", key)
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        details = json.loads(row[0])
+        details['URL'] = url
+        return details
+
+    def contains(self, site, url, search_mode):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM product_details WHERE site = ? AND url_key = ? AND search_mode = ?",
+                (site, canonical_url(url), search_mode)
+            ).fetchone()
+        return bool(row) and not (self.ttl_seconds and time.time() - row[0] > self.ttl_seconds)
+
+    def put(self, site, url, search_mode, details):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO product_details (site, url_key, search_mode, details, created_at) VALUES (?, ?, ?, ?, ?)",
+                (site, canonical_url(url), search_mode, json.dumps(details, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def summary(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0
+        return f"Product details cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
+
+def get_details_cache(path=None):
+    path = path or config.DETAILS_CACHE_FILE
+    with _shared_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = DetailsCache(path)
+        return _shared_caches[path]
@@ -0,0 +1,172 @@
+import queue
+import threading
+import time
+import psutil
+import config
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.__dict__['_driver'] = driver
+        self.__dict__['pages_loaded'] = 0
+        self.__dict__['started_at'] = time.time()
+
+    def get(self, url):
+        self.__dict__['pages_loaded'] += 1
+        return self._driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._driver, name, value)
+
+class DriverPool:
+    def __init__(self, size, max_pages=None, max_rss_mb=None, driver_factory=None, driver_wrapper=None):
+        self.size = max(1, size)
+        self.driver_factory = driver_factory
+        self.driver_wrapper = driver_wrapper
+        self.max_pages = max_pages if max_pages is not None else config.DRIVER_POOL_MAX_PAGES
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else config.DRIVER_POOL_MAX_RSS_MB
+        self._driver_path = None
+        self._path_lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._all = set()
+        self._all_lock = threading.Lock()
+        self._closed = False
+        self.stats = {'started': 0, 'recycled': 0, 'unhealthy': 0, 'failed_starts': 0}
+
+    def _log(self, msg):
+        print(msg)
+
+    def _resolve_driver_path(self):
+        with self._path_lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+            return self._driver_path
+
+    def _build_options(self):
+        options = webdriver.ChromeOptions()
+        options.add_experimental_option('excludeSwitches', ['enable-automation'])
+        options.add_experimental_option('useAutomationExtension', False)
+        options.add_argument('--disable-notifications')
+        # options.add_argument('--headless')
+        options.add_argument('--disable-gpu')
+        options.add_argument(f"user-agent={config.USER_AGENT}")
+        options.add_argument('--log-level=3')
+        return options
+
+    def _start_driver(self):
+        for attempt in range(config.DRIVER_POOL_START_RETRIES):
+            try:
+                if self.driver_factory:
+                    raw_driver = self.driver_factory()
+                else:
+                    service = Service(self._resolve_driver_path())
+                    raw_driver = webdriver.Chrome(service=service, options=self._build_options())
+                if self.driver_wrapper:
+                    raw_driver = self.driver_wrapper(raw_driver)
+                driver = PooledDriver(raw_driver)
+                with self._all_lock:
+                    self._all.add(driver)
+                self.stats['started'] += 1
+                return driver
+            except Exception as e:
+                self.stats['failed_starts'] += 1
+                self._log(f"  [Driver Pool] Could not start browser (attempt {attempt + 1}): {e}")
+        return None
+
+    def _replenish(self):
+        if self._closed:
+            return
+        driver = self._start_driver()
+        if self._closed and driver is not None:
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def warm_up(self):
+        if not self.driver_factory:
+            self._resolve_driver_path()
+        starters = [threading.Thread(target=self._replenish, daemon=True) for _ in range(self.size)]
+        for starter in starters:
+            starter.start()
+        for starter in starters:
+            starter.join()
+        self._log(f"  [Driver Pool] {self.stats['started']}/{self.size} browsers ready.")
+
+    def start_dedicated(self):
+        return self._start_driver()
+
+    def retire(self, driver):
+        if driver is not None:
+            self._discard(driver)
+
+    def is_healthy(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _browser_rss_mb(self, driver):
+        try:
+            root = psutil.Process(driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except Exception:
+            return 0
+
+    def _discard(self, driver):
+        with self._all_lock:
+            self._all.discard(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self):
+        driver = self._idle.get()
+        if driver is not None and not self.is_healthy(driver):
+            self.stats['unhealthy'] += 1
+            self._log("  [Driver Pool] Unhealthy browser session found. Replacing it.")
+            self._discard(driver)
+            driver = None
+        if driver is None:
+            driver = self._start_driver()
+        return driver
+
+    def release(self, driver):
+        if driver is None:
+            self._idle.put(None)
+            return
+
+        reason = None
+        if self.max_pages and driver.pages_loaded >= self.max_pages:
+            reason = f"{driver.pages_loaded} pages loaded"
+        elif self.max_rss_mb:
+            rss_mb = self._browser_rss_mb(driver)
+            if rss_mb >= self.max_rss_mb:
+                reason = f"{rss_mb:.0f} MB RSS"
+
+        if reason:
+            self.stats['recycled'] += 1
+            self._log(f"  [Driver Pool] Recycling browser ({reason}).")
+            self._discard(driver)
+            threading.Thread(target=self._replenish, daemon=True).start()
+        else:
+            self._idle.put(driver)
+
+    def close(self):
+        self._closed = True
+        with self._all_lock:
+            drivers = list(self._all)
+            self._all.clear()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self._log(f"  [Driver Pool] Closed. Started: {self.stats['started']}, recycled: {self.stats['recycled']}, unhealthy: {self.stats['unhealthy']}.")
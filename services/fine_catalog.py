@@ -0,0 +1,129 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import config
+from services.candidate_scorer import tokenize
+
+_shared_catalogs = {}
+_shared_lock = threading.Lock()
+
+class FineCatalog:
+    def __init__(self, path=None):
+        self.path = path or config.FINE_CATALOG_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                url TEXT,
+                search_mode TEXT,
+                title TEXT,
+                details TEXT,
+                crawled_at REAL,
+                PRIMARY KEY (url, search_mode)
+            );
+            CREATE TABLE IF NOT EXISTS title_terms (
+                term TEXT,
+                url TEXT,
+                PRIMARY KEY (term, url)
+            );
+            CREATE TABLE IF NOT EXISTS crawls (
+                started_at REAL,
+                finished_at REAL,
+                pages INTEGER,
+                products INTEGER,
+                complete INTEGER
+            );
+        """)
+        self._conn.commit()
+
+    def add_product(self, url, title, details_by_mode):
+        now = time.time()
+        with self._lock:
+            for search_mode, details in details_by_mode.items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO products (url, search_mode, title, details, crawled_at) VALUES (?, ?, ?, ?, ?)",
+                    (url, search_mode, title, json.dumps(details, ensure_ascii=False), now)
+                )
+            self._conn.execute("DELETE FROM title_terms WHERE url = ?", (url,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO title_terms (term, url) VALUES (?, ?)",
+                [(term, url) for term in tokenize(title)]
+            )
+            self._conn.commit()
+
+    def record_crawl(self, started_at, pages, products, complete):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO crawls (started_at, finished_at, pages, products, complete) VALUES (?, ?, ?, ?, ?)",
+                (started_at, time.time(), pages, products, int(complete))
+            )
+            if complete and products:
+                # Only a crawl that reached the last listing page knows that whatever it did not see is delisted.
+                self._conn.execute("DELETE FROM products WHERE crawled_at < ?", (started_at,))
+                self._conn.execute("DELETE FROM title_terms WHERE url NOT IN (SELECT url FROM products)")
+            self._conn.commit()
+
+    def is_fresh(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(finished_at) FROM crawls WHERE complete = 1 AND products > 0").fetchone()
+        return bool(row and row[0]) and time.time() - row[0] <= config.FINE_CATALOG_MAX_AGE_HOURS * 3600
+
+    def search(self, keyword, search_mode, limit=None):
+        terms = tokenize(keyword)
+        if not terms:
+            return []
+        placeholders = ', '.join('?' for _ in terms)
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT p.details, COUNT(*) AS matched
+                FROM title_terms t JOIN products p ON p.url = t.url AND p.search_mode = ?
+                WHERE t.term IN ({placeholders})
+                GROUP BY p.url
+                ORDER BY matched DESC, p.title
+                LIMIT ?
+            """, (search_mode, *terms, limit or config.FINE_CATALOG_MAX_CANDIDATES)).fetchall()
+        return [json.loads(details) for details, _ in rows]
+
+    def summary(self):
+        with self._lock:
+            products = self._conn.execute("SELECT COUNT(DISTINCT url) FROM products").fetchone()[0]
+            last_crawl = self._conn.execute("SELECT finished_at, pages, complete FROM crawls ORDER BY finished_at DESC LIMIT 1").fetchone()
+        if not last_crawl:
+            return f"Fine catalog '{self.path}': {products} products, never crawled"
+        age_hours = (time.time() - last_crawl[0]) / 3600
+        state = 'complete' if last_crawl[2] else 'partial'
+        return f"Fine catalog '{self.path}': {products} products, last crawl {age_hours:.1f}h ago ({last_crawl[1]} pages, {state})"
+
+def get_fine_catalog(path=None):
+    path = path or config.FINE_CATALOG_FILE
+    with _shared_lock:
+        if path not in _shared_catalogs:
+            _shared_catalogs[path] = FineCatalog(path)
+        return _shared_catalogs[path]
+
+def main():
+    from services.driver_pool import DriverPool
+    from scrapers.fine_scraper import FineScraper
+
+    parser = argparse.ArgumentParser(description="Crawl Fine Store's listings into the local catalog used to answer Fine searches offline.")
+    parser.add_argument('--catalog', default=config.FINE_CATALOG_FILE)
+    parser.add_argument('--max-pages', type=int, default=config.FINE_CATALOG_MAX_PAGES)
+    parser.add_argument('--max-products', type=int, default=config.FINE_CATALOG_MAX_PRODUCTS)
+    args = parser.parse_args()
+
+    catalog = get_fine_catalog(args.catalog)
+    driver_pool = DriverPool(1)
+    driver_pool.warm_up()
+    driver = driver_pool.acquire()
+    try:
+        FineScraper(driver, relevance_agent=None).crawl_catalog(catalog, args.max_pages, args.max_products)
+    finally:
+        driver_pool.release(driver)
+        driver_pool.close()
+    print(catalog.summary())
+
+if __name__ == "__main__":
+    from services.fine_catalog import main
+    main()
@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urljoin
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException, InvalidSelectorException
+from utils import make_soup
+
+EMPTY_PAGE = "<html><head></head><body></body></html>"
+
+class PageArchive:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(self.root, 'blobs'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite'), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT,
+                recorded_at REAL,
+                sha256 TEXT,
+                source TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_url ON pages (url, recorded_at)")
+        self._conn.commit()
+        self.stored = 0
+        self.served = 0
+        self.missing = 0
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[:2], f"{digest}.html.gz")
+
+    def store(self, url, html, source='browser'):
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            self._conn.execute(
+                "INSERT INTO pages (url, recorded_at, sha256, source) VALUES (?, ?, ?, ?)",
+                (url, time.time(), digest, source)
+            )
+            self._conn.commit()
+            self.stored += 1
+        return digest
+
+    def load(self, url, source=None):
+        with self._lock:
+            if source:
+                row = self._conn.execute(
+                    "SELECT sha256 FROM pages WHERE url = ? AND source = ? ORDER BY recorded_at DESC LIMIT 1", (url, source)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT sha256 FROM pages WHERE url = ? ORDER BY source = 'browser' DESC, recorded_at DESC LIMIT 1", (url,)
+                ).fetchone()
+            if row is None:
+                self.missing += 1
+                return None
+            self.served += 1
+        with gzip.open(self._blob_path(row[0]), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def summary(self):
+        return f"Page archive '{self.root}': {self.stored} stored, {self.served} served, {self.missing} missing"
+
+class RecordingDriver:
+    def __init__(self, driver, archive):
+        self.__dict__['_driver'] = driver
+        self.__dict__['archive'] = archive
+        self.__dict__['replaying'] = False
+        self.__dict__['_requested_urls'] = {}
+
+    def get(self, url):
+        self._driver.get(url)
+        self.note_request(url)
+
+    def note_request(self, url):
+        # Replay looks pages up by the URL the scraper asked for, not the one the browser was redirected to.
+        self._requested_urls[self._driver.current_url] = url
+
+    @property
+    def page_source(self):
+        html = self._driver.page_source
+        current_url = self._driver.current_url
+        requested_url = self._requested_urls.get(current_url, current_url)
+        self.archive.store(requested_url, html, 'browser')
+        if requested_url != current_url:
+            self.archive.store(current_url, html, 'browser')
+        return html
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._driver, name, value)
+
+class ReplayElement:
+    def __init__(self, driver, tag):
+        self._driver = driver
+        self._tag = tag
+
+    @property
+    def text(self):
+        return self._tag.get_text(" ", strip=True)
+
+    @property
+    def tag_name(self):
+        return self._tag.name
+
+    def get_attribute(self, name):
+        value = self._tag.get(name)
+        if isinstance(value, list):
+            value = " ".join(value)
+        if name in ('href', 'src') and value:
+            return urljoin(self._driver.current_url, value)
+        return value
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        href = self._tag.get('href')
+        if href:
+            self._driver.get(urljoin(self._driver.current_url, href))
+
+    def find_element(self, by=By.ID, value=None):
+        return self._driver._find(self._tag, by, value, first=True)
+
+    def find_elements(self, by=By.ID, value=None):
+        return self._driver._find(self._tag, by, value, first=False)
+
+class ReplayDriver:
+    def __init__(self, archive):
+        self.archive = archive
+        self.replaying = True
+        self.current_url = 'about:blank'
+        self.page_source = EMPTY_PAGE
+        self.window_handles = ['replay']
+        self.current_window_handle = 'replay'
+        self._soup = None
+
+    def _log(self, msg):
+        print(msg)
+
+    def get(self, url):
+        html = self.archive.load(url)
+        if html is None:
+            self._log(f"        -> [Replay] No archived page for {url[:100]}")
+            html = EMPTY_PAGE
+        self.current_url = url
+        self.page_source = html
+        self._soup = None
+
+    @property
+    def title(self):
+        title = self._document().find('title')
+        return title.get_text(strip=True) if title else ''
+
+    def _document(self):
+        if self._soup is None:
+            self._soup = make_soup(self.page_source)
+        return self._soup
+
+    def _find(self, root, by, value, first):
+        if by == By.XPATH:
+            match = re.match(r"^//(\w+|\*)\[contains\(text\(\),\s*'([^']*)'\)\]$", value or '')
+            if not match:
+                raise InvalidSelectorException(f"Replay driver only supports //tag[contains(text(), '...')] XPaths, got {value}")
+            tag_name = None if match.group(1) == '*' else match.group(1)
+            tags = [tag for tag in root.find_all(tag_name) if match.group(2) in tag.get_text()]
+        else:
+            selector = {
+                By.ID: f'[id="{value}"]',
+                By.CLASS_NAME: f'.{value}',
+                By.NAME: f'[name="{value}"]',
+                By.TAG_NAME: value,
+                By.CSS_SELECTOR: value,
+            }.get(by)
+            if selector is None:
+                raise InvalidSelectorException(f"Replay driver does not support locator '{by}'")
+            tags = root.select(selector)
+
+        elements = [ReplayElement(self, tag) for tag in tags]
+        if first:
+            if not elements:
+                raise NoSuchElementException(f"{by}={value}")
+            return elements[0]
+        return elements
+
+    def find_element(self, by=By.ID, value=None):
+        return self._find(self._document(), by, value, first=True)
+
+    def find_elements(self, by=By.ID, value=None):
+        return self._find(self._document(), by, value, first=False)
+
+    def execute_script(self, script, *args):
+        if 'click()' in script and args and isinstance(args[0], ReplayElement):
+            args[0].click()
+        return None
+
+    def quit(self):
+        pass
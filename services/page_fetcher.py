@@ -0,0 +1,125 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import config
+from utils import make_soup
+from services.tab_manager import TabManager
+from services.wait_policy import WaitPolicy
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({
+                'User-Agent': config.USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9',
+            })
+            adapter = HTTPAdapter(pool_connections=len(config.HTTP_FIRST_SITES), pool_maxsize=config.HTTP_POOL_MAXSIZE)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+def _record(site, outcome):
+    with _stats_lock:
+        site_stats = _stats.setdefault(site, {'http': 0, 'fallback': 0, 'browser': 0, 'tab': 0})
+        site_stats[outcome] += 1
+
+def summarize_fetch_stats():
+    with _stats_lock:
+        lines = []
+        for site, site_stats in sorted(_stats.items()):
+            attempted = site_stats['http'] + site_stats['fallback']
+            fallback_rate = (site_stats['fallback'] / attempted * 100) if attempted else 0
+            lines.append(f"Fetcher '{site}': {site_stats['http']} via HTTP, {site_stats['fallback']} HTTP fallbacks ({fallback_rate:.1f}%), {site_stats['browser']} browser-only, {site_stats['tab']} from prefetched tabs")
+        return lines
+
+class PageFetcher:
+    def __init__(self, driver, site, stats_label=None):
+        self.driver = driver
+        self.site = site
+        self.stats_label = stats_label or site
+        self.tabs = TabManager(driver, site)
+        self.waits = WaitPolicy(driver, site)
+        self.last_outcome = None
+
+    def _log(self, msg):
+        print(msg)
+
+    def http_enabled(self):
+        return config.HTTP_FIRST_SITES.get(self.site, False)
+
+    def _download(self, url):
+        archive = getattr(self.driver, 'archive', None)
+        if getattr(self.driver, 'replaying', False):
+            html = archive.load(url, 'http')
+            return (200, html) if html is not None else (404, None)
+
+        response = _get_session().get(url, timeout=(config.HTTP_CONNECT_TIMEOUT_SECONDS, config.HTTP_READ_TIMEOUT_SECONDS))
+        if archive is not None and response.status_code == 200:
+            archive.store(url, response.text, 'http')
+        return response.status_code, response.text
+
+    def _record(self, outcome):
+        self.last_outcome = outcome
+        _record(self.stats_label, outcome)
+
+    def uses_browser(self):
+        return not self.http_enabled() or self.last_outcome == 'fallback'
+
+    def prefetch(self, url, upcoming_urls):
+        if self.uses_browser():
+            self.tabs.prefetch(url, upcoming_urls)
+
+    def close_tabs(self):
+        self.tabs.close_all()
+
+    def fetch_http(self, url, required_selectors, parse_only=None):
+        if not self.http_enabled():
+            self._record('browser')
+            return None
+        try:
+            status_code, html = self._download(url)
+            if status_code == 200:
+                soup = make_soup(html, parse_only)
+                missing = [selector for selector in required_selectors if not soup.select_one(selector)]
+                if not missing:
+                    self._record('http')
+                    return soup
+                self._log(f"        -> HTTP fetch missing {missing}. Falling back to browser.")
+            else:
+                self._log(f"        -> HTTP fetch returned {status_code}. Falling back to browser.")
+        except requests.exceptions.RequestException as e:
+            self._log(f"        -> HTTP fetch failed ({type(e).__name__}). Falling back to browser.")
+        self._record('fallback')
+        return None
+
+    def _fetch_from_tab(self, url, wait_condition, timeout, parse_only):
+        self.tabs.switch_to(url)
+        try:
+            if wait_condition is not None:
+                self.waits.require('product page', wait_condition, timeout)
+            note_request = getattr(self.driver, 'note_request', None)
+            if note_request:
+                note_request(url)
+            _record(self.stats_label, 'tab')
+            return make_soup(self.driver.page_source, parse_only)
+        finally:
+            self.tabs.release(url)
+
+    def fetch(self, url, required_selectors, wait_condition=None, timeout=10, parse_only=None):
+        if self.tabs.has(url):
+            return self._fetch_from_tab(url, wait_condition, timeout, parse_only)
+        soup = self.fetch_http(url, required_selectors, parse_only)
+        if soup is not None:
+            return soup
+        self.driver.get(url)
+        if wait_condition is not None:
+            self.waits.require('product page', wait_condition, timeout)
+        return make_soup(self.driver.page_source, parse_only)
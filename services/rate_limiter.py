@@ -0,0 +1,96 @@
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import config
+
+_shared_limiters = {}
+_shared_lock = threading.Lock()
+
+def parse_retry_after(response):
+    header = response.headers.get('Retry-After') if response is not None else None
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    try:
+        for detail in response.json().get('error', {}).get('details', []):
+            match = re.match(r'^(\d+(?:\.\d+)?)s$', str(detail.get('retryDelay', '')))
+            if match:
+                return float(match.group(1))
+    except Exception:
+        pass
+    return None
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled_seconds = 0.0
+        self.backoffs = 0
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._request_allowance = min(self.requests_per_minute, self._request_allowance + elapsed * self.requests_per_minute / 60)
+        self._token_allowance = min(self.tokens_per_minute, self._token_allowance + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens=1):
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._request_allowance >= 1 and self._token_allowance >= tokens:
+                        self._request_allowance -= 1
+                        self._token_allowance -= tokens
+                        return
+                    wait = max(
+                        (1 - self._request_allowance) * 60 / self.requests_per_minute,
+                        (tokens - self._token_allowance) * 60 / self.tokens_per_minute
+                    )
+            self._sleep(wait)
+
+    def _sleep(self, seconds):
+        time.sleep(seconds)
+        with self._lock:
+            self.throttled_seconds += seconds
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, config.AI_BACKOFF_BASE_SECONDS)
+        else:
+            ceiling = min(config.AI_BACKOFF_MAX_SECONDS, config.AI_BACKOFF_BASE_SECONDS * (2 ** attempt))
+            delay = random.uniform(ceiling / 2, ceiling)
+        with self._lock:
+            self.backoffs += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+    def summary(self):
+        return f"{self.throttled_seconds:.1f}s throttled, {self.backoffs} backoffs"
+
+def get_rate_limiter(name, requests_per_minute=None, tokens_per_minute=None):
+    with _shared_lock:
+        if name not in _shared_limiters:
+            _shared_limiters[name] = RateLimiter(
+                requests_per_minute or config.GEMINI_REQUESTS_PER_MINUTE,
+                tokens_per_minute or config.GEMINI_TOKENS_PER_MINUTE
+            )
+        return _shared_limiters[name]
+
+def summarize_rate_limiters():
+    with _shared_lock:
+        return [f"Rate limiter '{name}': {limiter.summary()}" for name, limiter in _shared_limiters.items()]
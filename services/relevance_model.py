@@ -0,0 +1,183 @@
+import argparse
+import sqlite3
+import threading
+import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+import config
+from services.candidate_scorer import tokenize
+
+PAIR_SEPARATOR = '\x1f'
+
+_shared_models = {}
+_shared_lock = threading.Lock()
+
+def pair_features(pair):
+    query, title = pair.split(PAIR_SEPARATOR, 1)
+    query_tokens = tokenize(query)
+    title_tokens = tokenize(title)
+    query_key = '_'.join(sorted(query_tokens))
+    shared = title_tokens & query_tokens
+
+    features = [f"t:{token}" for token in title_tokens]
+    features += [f"q:{query_key}|t:{token}" for token in title_tokens]
+    features += [f"shared:{token}" for token in shared]
+    features += [f"missing:{token}" for token in query_tokens - title_tokens]
+    if query_tokens:
+        features.append(f"overlap:{round(len(shared) / len(query_tokens) * 4)}")
+    return features
+
+def load_training_rows(cache_path, prompt_version=None):
+    conn = sqlite3.connect(cache_path)
+    try:
+        if prompt_version is None:
+            row = conn.execute(
+                "SELECT prompt_version FROM verdicts GROUP BY prompt_version ORDER BY MAX(created_at) DESC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None, []
+            prompt_version = row[0]
+        rows = conn.execute(
+            "SELECT title, query, verdict FROM verdicts WHERE prompt_version = ? AND title IS NOT NULL AND query IS NOT NULL",
+            (prompt_version,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return prompt_version, rows
+
+class RelevanceModel:
+    def __init__(self, prompt_version, confidence=None):
+        self.prompt_version = prompt_version
+        self.confidence = confidence if confidence is not None else config.RELEVANCE_MODEL_CONFIDENCE
+        self.pipeline = make_pipeline(
+            TfidfVectorizer(analyzer=pair_features, sublinear_tf=True),
+            LogisticRegression(class_weight='balanced', max_iter=1000)
+        )
+        self.trained_rows = 0
+        self.report = None
+        self._lock = threading.Lock()
+        self.decided = 0
+        self.deferred = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['decided'] = state['deferred'] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _pairs(self, titles, queries):
+        return [f"{query}{PAIR_SEPARATOR}{title}" for title, query in zip(titles, queries)]
+
+    def fit(self, rows):
+        titles, queries, verdicts = zip(*rows)
+        self.pipeline.fit(self._pairs(titles, queries), [int(verdict) for verdict in verdicts])
+        self.trained_rows = len(rows)
+        return self
+
+    def probabilities(self, titles, queries):
+        return [float(p) for p in self.pipeline.predict_proba(self._pairs(titles, queries))[:, 1]]
+
+    def decide(self, title, query):
+        return self.decide_many([title], query)[0]
+
+    def decide_many(self, titles, query):
+        decisions = []
+        for probability in self.probabilities(titles, [query] * len(titles)):
+            if probability >= self.confidence:
+                decisions.append(True)
+            elif probability <= 1 - self.confidence:
+                decisions.append(False)
+            else:
+                decisions.append(None)
+        with self._lock:
+            self.decided += sum(decision is not None for decision in decisions)
+            self.deferred += sum(decision is None for decision in decisions)
+        return decisions
+
+    def evaluate(self, rows):
+        titles, queries, verdicts = zip(*rows)
+        probabilities = self.probabilities(titles, queries)
+        predictions = [probability >= 0.5 for probability in probabilities]
+        confident = [(p >= 0.5, bool(v)) for p, v in zip(probabilities, verdicts)
+                     if p >= self.confidence or p <= 1 - self.confidence]
+        true_positives = sum(prediction and bool(verdict) for prediction, verdict in zip(predictions, verdicts))
+
+        return {
+            'rows': len(rows),
+            'accuracy': sum(prediction == bool(verdict) for prediction, verdict in zip(predictions, verdicts)) / len(rows),
+            'precision': true_positives / max(1, sum(predictions)),
+            'recall': true_positives / max(1, sum(bool(verdict) for verdict in verdicts)),
+            'coverage': len(confident) / len(rows),
+            'confident_accuracy': (sum(p == v for p, v in confident) / len(confident)) if confident else 0.0,
+        }
+
+    def summary(self):
+        total = self.decided + self.deferred
+        local_rate = (self.decided / total * 100) if total else 0
+        return f"Local relevance model: {self.decided} decided locally, {self.deferred} deferred to Gemini ({local_rate:.1f}% local)"
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @classmethod
+    def load(cls, path):
+        return joblib.load(path)
+
+def get_relevance_model(path=None):
+    path = path or config.RELEVANCE_MODEL_FILE
+    with _shared_lock:
+        if path not in _shared_models:
+            try:
+                _shared_models[path] = RelevanceModel.load(path)
+            except FileNotFoundError:
+                _shared_models[path] = None
+            except Exception as e:
+                print(f"Could not load local relevance model '{path}': {e}")
+                _shared_models[path] = None
+        return _shared_models[path]
+
+def format_report(report):
+    return "\n".join([
+        f"  Held-out rows:        {report['rows']}",
+        f"  Agreement w/ Gemini:  {report['accuracy'] * 100:.1f}%",
+        f"  Precision / recall:   {report['precision'] * 100:.1f}% / {report['recall'] * 100:.1f}%",
+        f"  Confident coverage:   {report['coverage'] * 100:.1f}% of decisions made locally",
+        f"  Confident agreement:  {report['confident_accuracy'] * 100:.1f}%",
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local relevance model from cached Gemini verdicts.")
+    parser.add_argument('--cache', default=config.VERDICT_CACHE_FILE)
+    parser.add_argument('--output', default=config.RELEVANCE_MODEL_FILE)
+    parser.add_argument('--prompt-version', default=None)
+    args = parser.parse_args()
+
+    prompt_version, rows = load_training_rows(args.cache, args.prompt_version)
+    labels = {bool(verdict) for _, _, verdict in rows}
+    if len(rows) < config.RELEVANCE_MODEL_MIN_TRAINING_ROWS or len(labels) < 2:
+        print(f"Not enough verdicts to train: {len(rows)} rows with labels {sorted(labels)} "
+              f"(need {config.RELEVANCE_MODEL_MIN_TRAINING_ROWS} with both outcomes).")
+        return
+
+    print(f"Training on {len(rows)} Gemini verdicts (prompt version {prompt_version})")
+    train_rows, holdout_rows = train_test_split(
+        rows, test_size=config.RELEVANCE_MODEL_HOLDOUT, random_state=0, stratify=[verdict for _, _, verdict in rows]
+    )
+    model = RelevanceModel(prompt_version).fit(train_rows)
+    model.report = model.evaluate(holdout_rows)
+    print("Accuracy vs Gemini on held-out verdicts:")
+    print(format_report(model.report))
+
+    model.fit(rows)
+    model.save(args.output)
+    print(f"Model saved to '{args.output}'")
+
+if __name__ == "__main__":
+    from services.relevance_model import main
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import sqlite3
+import threading
+import pandas as pd
+import config
+
+KEY_COLUMNS = ('date', 'industry', 'source', 'url', 'type_of_product')
+
+def _column_value(row, column):
+    value = row.get(column)
+    if value is None:
+        # SQLite treats NULLs as distinct in UNIQUE keys, so a missing key field would insert a new row on every write.
+        return '' if column in KEY_COLUMNS else None
+    return str(value)
+
+def _price_value(price):
+    try:
+        return float(str(price).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
+
+class ResultStore:
+    def __init__(self, path=None):
+        self.path = path or config.RESULT_STORE_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        columns = ",\n".join(f"{column} TEXT" for column in config.CSV_COLUMNS)
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                {columns},
+                price_value REAL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE ({', '.join(KEY_COLUMNS)})
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_source ON results (source)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_url_date ON results (url, date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_date ON results (date)")
+        self._conn.commit()
+
+    def __str__(self):
+        return f"'{self.path}'"
+
+    def write(self, rows):
+        columns = list(config.CSV_COLUMNS) + ['price_value']
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column not in KEY_COLUMNS)
+        statement = (
+            f"INSERT INTO results ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP"
+        )
+        values = [
+            [_column_value(row, column) for column in config.CSV_COLUMNS] + [_price_value(row.get('price_sar'))]
+            for row in rows
+        ]
+        with self._lock:
+            self._conn.executemany(statement, values)
+            self._conn.commit()
+
+    def price_history(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT date, source, MAX(product), MAX(price_value) FROM results WHERE url = ? GROUP BY date, source ORDER BY date",
+                (url,)
+            ).fetchall()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _frame(self, date_from=None):
+        query = f"SELECT {', '.join(config.CSV_COLUMNS)} FROM results"
+        params = ()
+        if date_from:
+            query += " WHERE date >= ?"
+            params = (date_from,)
+        with self._lock:
+            return pd.read_sql_query(query + " ORDER BY date, industry, source", self._conn, params=params)
+
+    def export_csv(self, path, date_from=None):
+        frame = self._frame(date_from)
+        frame.to_csv(path, index=False, encoding='utf-8')
+        return len(frame)
+
+    def export_parquet(self, root, date_from=None):
+        frame = self._frame(date_from)
+        frame.to_parquet(root, partition_cols=['date'], index=False, existing_data_behavior='delete_matching')
+        return len(frame)
+
+    def import_csv(self, path):
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+        rows = frame.reindex(columns=config.CSV_COLUMNS, fill_value='').to_dict('records')
+        self.write(rows)
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and export the scraped results store.")
+    parser.add_argument('--store', default=config.RESULT_STORE_FILE)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_csv = commands.add_parser('export-csv', help="Write the stored results to a CSV file.")
+    export_csv.add_argument('path')
+    export_csv.add_argument('--since', help="Only export rows on or after this date (YYYY-MM-DD).")
+    export_parquet = commands.add_parser('export-parquet', help="Write the stored results as Parquet, partitioned by date.")
+    export_parquet.add_argument('path')
+    export_parquet.add_argument('--since', help="Only export rows on or after this date (YYYY-MM-DD).")
+    import_csv = commands.add_parser('import-csv', help="Upsert the rows of an existing results CSV into the store.")
+    import_csv.add_argument('path')
+    history = commands.add_parser('history', help="Print the price history of a product URL.")
+    history.add_argument('url')
+    args = parser.parse_args()
+
+    store = ResultStore(args.store)
+    if args.command == 'export-csv':
+        print(f"Exported {store.export_csv(args.path, args.since)} rows to '{args.path}'")
+    elif args.command == 'export-parquet':
+        print(f"Exported {store.export_parquet(args.path, args.since)} rows to '{args.path}'")
+    elif args.command == 'import-csv':
+        print(f"Imported {store.import_csv(args.path)} rows from '{args.path}'")
+    elif args.command == 'history':
+        for date, source, product, price in store.price_history(args.url):
+            print(f"{date}  {source:<10} {price if price is not None else 'N/A':>10}  {product}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import csv
+import os
+import queue
+import threading
+import time
+import config
+
+_STOP = object()
+
+class CsvResultSink:
+    def __init__(self, path, fieldnames):
+        self.path = path
+        self.fieldnames = fieldnames
+        if not os.path.exists(self.path):
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                csv.DictWriter(f, fieldnames=self.fieldnames).writeheader()
+
+    def __str__(self):
+        return f"'{self.path}'"
+
+    def write(self, rows):
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+class ResultWriter:
+    def __init__(self, sink, batch_size=None, flush_seconds=None, on_flush=None):
+        self.sink = sink
+        self.batch_size = batch_size or config.RESULT_WRITER_BATCH_SIZE
+        self.flush_seconds = flush_seconds or config.RESULT_WRITER_FLUSH_SECONDS
+        self.on_flush = on_flush
+        self.rows_written = 0
+        self.flushes = 0
+        self._queue = queue.Queue(maxsize=config.RESULT_WRITER_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name='result-writer', daemon=True)
+        self._thread.start()
+
+    def _log(self, msg):
+        print(msg)
+
+    def submit(self, rows, task=None):
+        self._queue.put((task, rows))
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self.sink.close()
+
+    def _run(self):
+        pending = []
+        pending_rows = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(pending)
+                return
+            if item is not None:
+                pending.append(item)
+                pending_rows += len(item[1])
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+
+            if pending and (pending_rows >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending = []
+                pending_rows = 0
+                deadline = None
+
+    def _flush(self, pending):
+        if not pending:
+            return
+        rows = [row for _, task_rows in pending for row in task_rows]
+        if rows:
+            try:
+                self.sink.write(rows)
+            except Exception as e:
+                self._log(f"  [Result Writer] Error writing {len(rows)} rows to {self.sink}: {e}")
+                return
+            self.rows_written += len(rows)
+            self.flushes += 1
+            self._log(f"  [Result Writer] Flushed {len(rows)} rows to {self.sink}.")
+        if self.on_flush:
+            try:
+                self.on_flush(pending)
+            except Exception as e:
+                self._log(f"  [Result Writer] Error in flush callback for {len(pending)} tasks: {e}")
+
+    def summary(self):
+        return f"Result writer: {self.rows_written} rows in {self.flushes} flushes to {self.sink}"
@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import Future
+
+class ScrapeMemo:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, site, keyword, search_mode):
+        return (site, ' '.join(str(keyword).lower().split()), search_mode)
+
+    def get_or_run(self, site, keyword, search_mode, scrape):
+        key = self._key(site, keyword, search_mode)
+        while True:
+            with self._lock:
+                future = self._futures.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._futures[key] = future
+                    self.misses += 1
+            if owner:
+                break
+            # A failed owner drops its key, so a waiter retries the search itself instead of sharing the error.
+            if future.exception() is None:
+                with self._lock:
+                    self.hits += 1
+                return future.result(), True
+
+        try:
+            result = scrape()
+        except BaseException as e:
+            with self._lock:
+                self._futures.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result, False
+
+    def summary(self):
+        total = self.hits + self.misses
+        return f"Scrape memo: {self.hits}/{total} site searches reused from earlier tasks"
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from selenium.common.exceptions import WebDriverException
+import config
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(site, outcome):
+    with _stats_lock:
+        site_stats = _stats.setdefault(site, {'opened': 0, 'used': 0})
+        site_stats[outcome] += 1
+
+def summarize_tab_stats():
+    with _stats_lock:
+        return [f"Tabs '{site}': {site_stats['used']}/{site_stats['opened']} prefetched tabs used"
+                for site, site_stats in sorted(_stats.items())]
+
+class TabManager:
+    def __init__(self, driver, site, depth=None):
+        self.driver = driver
+        self.site = site
+        self.depth = depth if depth is not None else config.TAB_PREFETCH_DEPTH.get(site, 0)
+        self._main_handle = None
+        self._tabs = OrderedDict()
+
+    def _log(self, msg):
+        print(msg)
+
+    def enabled(self):
+        return self.depth > 0 and not getattr(self.driver, 'replaying', False)
+
+    def _open(self, url):
+        known_handles = set(self.driver.window_handles)
+        self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+        new_handles = [handle for handle in self.driver.window_handles if handle not in known_handles]
+        if new_handles:
+            self._tabs[url] = new_handles[0]
+            _record(self.site, 'opened')
+
+    def _close(self, handle):
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        except WebDriverException:
+            pass
+        finally:
+            self.driver.switch_to.window(self._main_handle)
+
+    def prefetch(self, current_url, upcoming_urls):
+        if not self.enabled():
+            return
+        try:
+            if self._main_handle is None:
+                self._main_handle = self.driver.current_window_handle
+            wanted = [url for url in dict.fromkeys(upcoming_urls) if url != current_url][:self.depth]
+            for url in [url for url in self._tabs if url != current_url and url not in wanted]:
+                self._close(self._tabs.pop(url))
+            for url in wanted:
+                if url not in self._tabs:
+                    self._open(url)
+        except WebDriverException as e:
+            self._log(f"        -> Tab prefetch failed ({type(e).__name__}). Loading pages one at a time.")
+            self.depth = 0
+            self.close_all()
+
+    def has(self, url):
+        return url in self._tabs
+
+    def switch_to(self, url):
+        self.driver.switch_to.window(self._tabs[url])
+        _record(self.site, 'used')
+
+    def release(self, url):
+        handle = self._tabs.pop(url, None)
+        if handle is not None:
+            self._close(handle)
+
+    def close_all(self):
+        try:
+            while self._tabs:
+                self._close(self._tabs.popitem(last=False)[1])
+        except WebDriverException:
+            self._tabs.clear()
+        self._main_handle = None
@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+import time
+
+class TaskJournal:
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._completed = set()
+        if resume:
+            self._load()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _task_key(self, task):
+        return (task['industry'], task['type_of_product'], task['site'])
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('event') == 'task':
+                    self._completed.add(tuple(entry['key']))
+
+    def is_completed(self, task):
+        return self._task_key(task) in self._completed
+
+    def record_task(self, task, rows):
+        key = self._task_key(task)
+        entry = {'event': 'task', 'key': list(key), 'keyword': task['keyword'], 'rows': rows, 'finished_at': time.time()}
+        with self._lock:
+            self._completed.add(key)
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,118 @@
+import hashlib
+import random
+import re
+import threading
+import config
+from services.verdict_cache import normalize_title
+from services.candidate_scorer import tokenize, TOOL_TERMS, AUTOMOTIVE_TERMS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_QUANTITY_PATTERN = re.compile(r'\b\d+(?:[.,]\d+)?\s*(?:ml|ltr|l|kg|g|oz|pcs|pc|x)?\b|\bx\b')
+_SUFFIX_PATTERN = re.compile(r'\s+[-|]\s+([^-|]+?)\s*$')
+
+_USE_TERMS = tokenize(' '.join(config.TITLE_INDEX_USE_WORDS)) | TOOL_TERMS | AUTOMOTIVE_TERMS
+
+_shared_indexes = {}
+_shared_lock = threading.Lock()
+
+def title_words(title):
+    title = str(title or '')
+    suffix = _SUFFIX_PATTERN.search(title)
+    if suffix and normalize_title(suffix.group(1)) in config.TITLE_INDEX_SELLER_SUFFIXES:
+        title = title[:suffix.start()]
+    return frozenset(_QUANTITY_PATTERN.sub(' ', normalize_title(title).replace('.', ' ')).split())
+
+def shingle_title(title, size=None):
+    size = size or config.TITLE_INDEX_SHINGLE_SIZE
+    shingles = set()
+    for word in title_words(title):
+        padded = f" {word} "
+        if len(padded) <= size:
+            shingles.add(padded)
+        else:
+            shingles.update(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return shingles
+
+def _differs_in_use(words, other_words):
+    # A surface, room or vehicle word on only one side makes it a different product however similar the rest is.
+    return bool(tokenize(' '.join(words ^ other_words)) & _USE_TERMS)
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class TitleIndex:
+    def __init__(self, threshold=None, num_perm=None, bands=None):
+        self.threshold = threshold if threshold is not None else config.TITLE_INDEX_THRESHOLD
+        self.num_perm = num_perm or config.TITLE_INDEX_NUM_PERM
+        self.bands = bands or config.TITLE_INDEX_BANDS
+        self.rows_per_band = self.num_perm // self.bands
+        generator = random.Random(0)
+        self._permutations = [(generator.randrange(1, _MERSENNE_PRIME), generator.randrange(0, _MERSENNE_PRIME))
+                              for _ in range(self.num_perm)]
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._entries = {}
+        self._known = set()
+        self.hits = 0
+        self.lookups = 0
+
+    def _signature(self, shingles):
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') for s in shingles]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._permutations]
+
+    def _band_keys(self, namespace, signature):
+        for band in range(self.bands):
+            start = band * self.rows_per_band
+            yield (namespace, band, tuple(signature[start:start + self.rows_per_band]))
+
+    def add(self, title, namespace, verdict):
+        known_key = (namespace, normalize_title(title))
+        with self._lock:
+            if known_key in self._known:
+                return
+        shingles = shingle_title(title)
+        if not shingles:
+            return
+        signature = self._signature(shingles)
+        with self._lock:
+            self._known.add(known_key)
+            entry_id = len(self._entries)
+            self._entries[entry_id] = (title, title_words(title), shingles, verdict)
+            for band_key in self._band_keys(namespace, signature):
+                self._buckets.setdefault(band_key, []).append(entry_id)
+
+    def lookup(self, title, namespace):
+        shingles = shingle_title(title)
+        with self._lock:
+            self.lookups += 1
+        if not shingles:
+            return None
+        words = title_words(title)
+        signature = self._signature(shingles)
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(namespace, signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            best = None
+            for entry_id in candidates:
+                matched_title, matched_words, matched_shingles, verdict = self._entries[entry_id]
+                if _differs_in_use(words, matched_words):
+                    continue
+                similarity = _jaccard(shingles, matched_shingles)
+                if similarity >= self.threshold and (best is None or similarity > best[2]):
+                    best = (verdict, matched_title, similarity)
+            if best is not None:
+                self.hits += 1
+            return best
+
+    def summary(self):
+        hit_rate = (self.hits / self.lookups * 100) if self.lookups else 0
+        return f"Near-duplicate title index: {len(self._entries)} titles, {self.hits}/{self.lookups} lookups reused a verdict ({hit_rate:.1f}%)"
+
+def get_title_index():
+    with _shared_lock:
+        if 'default' not in _shared_indexes:
+            _shared_indexes['default'] = TitleIndex()
+        return _shared_indexes['default']
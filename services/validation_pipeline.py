@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+class ValidationPipeline:
+    def __init__(self, relevance_agent, keyword, target, log=print, max_pending=None):
+        self.relevance_agent = relevance_agent
+        self.keyword = keyword
+        self.target = target
+        self.max_pending = max_pending or config.VALIDATION_MAX_PENDING
+        self._log = log
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='validation')
+        self._condition = threading.Condition()
+        self._queued = []
+        self._in_flight = 0
+        self._next_index = 0
+        self._accepted = {}
+        self._closed = False
+
+    def _accepted_count(self):
+        return len(self._accepted)
+
+    def _pending_count(self):
+        return len(self._queued) + self._in_flight
+
+    def is_satisfied(self):
+        with self._condition:
+            return self._accepted_count() >= self.target
+
+    def submit(self, product_details):
+        with self._condition:
+            self._queued.append((self._next_index, product_details))
+            self._next_index += 1
+            self._dispatch()
+
+    def _dispatch(self):
+        if self._closed or self._in_flight or not self._queued or self._accepted_count() >= self.target:
+            return
+        batch, self._queued = self._queued, []
+        self._in_flight = len(batch)
+        self._executor.submit(self._judge, batch)
+
+    def _judge(self, batch):
+        try:
+            verdicts = self.relevance_agent.is_relevant_many([details.get('Product') for _, details in batch], self.keyword)
+        except Exception as e:
+            self._log(f"      ! Error validating candidates with AI: {e}")
+            verdicts = [False] * len(batch)
+
+        with self._condition:
+            for (index, details), is_relevant in zip(batch, verdicts):
+                if is_relevant and self._accepted_count() < self.target:
+                    self._accepted[index] = details
+                    self._log(f"      -> AI VALIDATED: {details.get('Product', 'N/A')[:60]}...")
+                elif is_relevant:
+                    self._log(f"      -> IGNORED (target already reached): {details.get('Product', 'N/A')[:60]}...")
+                else:
+                    self._log(f"      -> DISCARDED BY AI (Not relevant): {details.get('Product', 'N/A')[:60]}...")
+            self._in_flight = 0
+            self._dispatch()
+            self._condition.notify_all()
+
+    def _wait_until_pending_at_most(self, limit):
+        with self._condition:
+            while self._accepted_count() < self.target and self._pending_count() > limit:
+                self._condition.wait()
+            return self._accepted_count() >= self.target
+
+    def throttle(self):
+        return self._wait_until_pending_at_most(self.max_pending - 1)
+
+    def drain(self):
+        return self._wait_until_pending_at_most(0)
+
+    def finish(self):
+        self.drain()
+        with self._condition:
+            self._closed = True
+            if self._queued:
+                self._log(f"      -> Ignoring {len(self._queued)} surplus candidate(s) awaiting AI validation.")
+                self._queued = []
+            accepted = [self._accepted[index] for index in sorted(self._accepted)]
+        self._executor.shutdown(wait=True)
+        return accepted[:self.target]
@@ -0,0 +1,86 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import config
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+def normalize_title(title):
+    text = re.sub(r'[^\w\s.]', ' ', str(title or '').lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+class VerdictCache:
+    def __init__(self, path=None, ttl_days=None, max_entries=None):
+        self.path = path or config.VERDICT_CACHE_FILE
+        self.ttl_seconds = (ttl_days if ttl_days is not None else config.VERDICT_CACHE_TTL_DAYS) * 86400
+        self.max_entries = max_entries if max_entries is not None else config.VERDICT_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                title TEXT,
+                query TEXT,
+                prompt_version TEXT,
+                verdict INTEGER,
+                created_at REAL,
+                last_used REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_last_used ON verdicts (last_used)")
+        self._conn.commit()
+
+    def _key(self, title, query, prompt_version):
+        raw = f"{normalize_title(title)}\x1f{normalize_title(query)}\x1f{prompt_version}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, title, query, prompt_version):
+        key = self._key(title, query, prompt_version)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT verdict, created_at FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return bool(row[0])
+
+    def put(self, title, query, prompt_version, verdict):
+        key = self._key(title, query, prompt_version)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, title, query, prompt_version, verdict, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, title, query, prompt_version, int(bool(verdict)), now, now)
+            )
+            if self.max_entries:
+                count = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+            self._conn.commit()
+
+    def summary(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0
+        return f"Verdict cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
+
+def get_verdict_cache(path=None):
+    path = path or config.VERDICT_CACHE_FILE
+    with _shared_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = VerdictCache(path)
+        return _shared_caches[path]
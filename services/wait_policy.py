@@ -0,0 +1,94 @@
+import threading
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+import config
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(site, kind, seconds, timed_out):
+    with _stats_lock:
+        site_stats = _stats.setdefault(site, {'seconds': 0.0, 'waits': 0, 'timeouts': 0})
+        site_stats['seconds'] += seconds
+        site_stats['waits'] += 1
+        site_stats['timeouts'] += int(timed_out)
+
+def summarize_wait_stats():
+    with _stats_lock:
+        return [f"Waits '{site}': {site_stats['seconds']:.1f}s over {site_stats['waits']} waits ({site_stats['timeouts']} hit their budget)"
+                for site, site_stats in sorted(_stats.items())]
+
+class WaitPolicy:
+    def __init__(self, driver, site):
+        self.driver = driver
+        self.site = site
+
+    def _budget(self, timeout):
+        return timeout if timeout is not None else config.WAIT_BUDGET_SECONDS.get(self.site, config.WAIT_DEFAULT_BUDGET_SECONDS)
+
+    def _wait(self, kind, condition, timeout):
+        if getattr(self.driver, 'replaying', False):
+            return True
+        started = time.monotonic()
+        timed_out = False
+        try:
+            WebDriverWait(self.driver, self._budget(timeout), poll_frequency=config.WAIT_POLL_SECONDS).until(condition)
+        except TimeoutException:
+            timed_out = True
+        finally:
+            _record(self.site, kind, time.monotonic() - started, timed_out)
+        return not timed_out
+
+    def _stable(self, probe):
+        state = {'value': None, 'since': None}
+
+        def condition(driver):
+            try:
+                value = probe(driver)
+            except WebDriverException:
+                return False
+            now = time.monotonic()
+            if value != state['value']:
+                state['value'], state['since'] = value, now
+                return False
+            return value is not None and now - state['since'] >= config.WAIT_SETTLE_SECONDS
+        return condition
+
+    def dom_ready(self, timeout=None):
+        return self._wait('dom_ready', lambda driver: driver.execute_script("return document.readyState") == "complete", timeout)
+
+    def network_idle(self, timeout=None):
+        def resource_count(driver):
+            if driver.execute_script("return document.readyState") != "complete":
+                return None
+            return driver.execute_script("return window.performance.getEntriesByType('resource').length")
+        return self._wait('network_idle', self._stable(resource_count), timeout)
+
+    def selector_present(self, css_selector, timeout=None):
+        return self._wait('selector_present', EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)), timeout)
+
+    def require(self, kind, condition, timeout=None):
+        if timeout is None:
+            timeout = config.WAIT_PAGE_BUDGET_SECONDS.get(self.site, config.WAIT_DEFAULT_PAGE_BUDGET_SECONDS)
+        if not self._wait(kind, condition, timeout):
+            raise TimeoutException(f"Waited {timeout}s for {kind} on {self.site}")
+
+    def require_selector(self, css_selector, timeout=None):
+        self.require(f"'{css_selector}'", EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)), timeout)
+
+    def selector_stable(self, css_selector, timeout=None):
+        return self._wait('selector_stable', self._stable(
+            lambda driver: len(driver.find_elements(By.CSS_SELECTOR, css_selector)) or None
+        ), timeout)
+
+    def clickable(self, element, timeout=None):
+        return self._wait('clickable', EC.element_to_be_clickable(element), timeout)
+
+    def gone(self, element, timeout=None):
+        return self._wait('gone', EC.invisibility_of_element(element), timeout)
+
+    def url_changes(self, previous_url, timeout=None):
+        return self._wait('url_changes', EC.url_changes(previous_url), timeout)
@@ -1,4 +1,20 @@
 import re
+from bs4 import BeautifulSoup, SoupStrainer, FeatureNotFound
+import config
+
+def make_soup(markup, parse_only=None):
+    strainer = None
+    if parse_only is not None and config.PARTIAL_PARSING:
+        strainer = parse_only if isinstance(parse_only, SoupStrainer) else SoupStrainer(parse_only)
+    try:
+        return BeautifulSoup(markup, config.HTML_PARSER, parse_only=strainer)
+    except FeatureNotFound:
+        return BeautifulSoup(markup, 'html.parser', parse_only=strainer)
+
+NO_RESULTS_PATTERN = re.compile(r"\b(?:no|0)\s+(?:results?|products?|items?|matches)\b|did not match any products|couldn't find any", re.I)
+
+def page_reports_no_results(page_source):
+    return bool(NO_RESULTS_PATTERN.search(make_soup(page_source, ['body']).get_text(' ', strip=True)))
 
 def parse_volume_string(text_string):
     if not text_string: